@@ -0,0 +1,337 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from itertools import count, islice
+
+import generar_datos
+import practicaFinal as app
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Practica03"))
+import practica03
+
+
+def commit_actual():
+    """/**
+    * Intenta saber en que commit se esta midiendo.
+    * @return hash del commit o None si no hay git.
+    */"""
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return salida.stdout.strip() or None
+
+
+def medir(funcion, repeticiones, preparar=None):
+    """/**
+    * Ejecuta una funcion varias veces sin sacar nada por pantalla.
+    * @param funcion funcion sin parametros a medir.
+    * @param repeticiones veces que se ejecuta.
+    * @param preparar funcion opcional que se llama antes de cada repeticion
+    *        y no cuenta en el tiempo.
+    * @return tupla (mejor tiempo, tiempo medio) en segundos.
+    */"""
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), sum(tiempos) / len(tiempos)
+
+
+def borrar_cache():
+    """/**
+    * Quita la cache binaria para forzar la lectura de los CSV.
+    * @return None
+    */"""
+    if os.path.exists(app.CACHE_FILE):
+        os.remove(app.CACHE_FILE)
+
+
+def operaciones(consultas, altas):
+    """/**
+    * Lista de operaciones que se miden, en el orden en que se ejecutan.
+    * Las que escriben en clientes.csv van al final para no invalidar la
+    * cache antes de medir la carga. Las consultas se miden con la cache de
+    * consultas vacia y, en las "_repetidas", con los resultados ya guardados.
+    * @param consultas numero de rangos de fechas por repeticion.
+    * @param altas numero de clientes que se dan de alta por repeticion.
+    * @return lista de tuplas (nombre, funcion, preparar).
+    */"""
+    azar = random.Random(99)
+    rangos = []
+    for _ in range(consultas):
+        inicio = generar_datos.FECHA_INICIO + timedelta(days=azar.randrange(generar_datos.DIAS_PERIODO))
+        rangos.append((inicio, inicio + timedelta(days=azar.randint(1, 60))))
+
+    def consultar_rangos():
+        for inicio, fin in rangos:
+            app.ventas_en_rango(inicio, fin)
+
+    def sumar_rangos():
+        for inicio, fin in rangos:
+            app.totales_en_rango(inicio, fin)
+
+    numeros = count()
+
+    def dar_altas():
+        for numero in islice(numeros, altas):
+            app.registrar_cliente(f"Cliente {numero}", f"bench{numero}@example.com", date(2024, 1, 1))
+
+    def importar():
+        app.importar_clientes(
+            (f"Cliente {numero}", f"bench{numero}@example.com", date(2024, 1, 1))
+            for numero in islice(numeros, altas)
+        )
+
+    return [
+        ('cargar_datos_csv', app.cargar_datos, borrar_cache),
+        ('cargar_datos_cache', app.cargar_datos, None),
+        (f'ventas_en_rango_x{consultas}', consultar_rangos, app.nueva_version_datos),
+        (f'ventas_en_rango_x{consultas}_repetidas', consultar_rangos, None),
+        (f'totales_en_rango_x{consultas}', sumar_rangos, None),
+        ('estadisticas', app.estadisticas, app.nueva_version_datos),
+        ('estadisticas_repetidas', app.estadisticas, None),
+        ('exportar_informe', app.exportar_informe, None),
+        (f'registrar_cliente_x{altas}', dar_altas, None),
+        (f'importar_clientes_x{altas}', importar, None),
+    ]
+
+
+def medir_escalado(procesos, repeticiones):
+    """/**
+    * Mide el informe por trozos con distintos numeros de procesos y
+    * comprueba que el fichero sale igual que el informe desde memoria.
+    * @param procesos lista de numeros de procesos a probar.
+    * @param repeticiones veces que se mide cada caso.
+    * @return lista de tuplas (procesos, mejor, media, identico).
+    */"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.exportar_informe()
+    with open(app.INFORME_FILE, encoding='utf-8') as f:
+        referencia = f.read()
+
+    resultados = []
+    for cantidad in procesos:
+        mejor, media = medir(lambda: app.exportar_informe_paralelo(cantidad), repeticiones)
+        with open(app.INFORME_FILE, encoding='utf-8') as f:
+            identico = f.read() == referencia
+        resultados.append((cantidad, mejor, media, identico))
+    return resultados
+
+
+def ejecutar(tamanos, repeticiones, consultas, altas, carpeta_base, escalado=None):
+    """/**
+    * Genera los datos de cada tamaño y mide todas las operaciones.
+    * @param tamanos lista con el numero de ventas de cada prueba.
+    * @param escalado numeros de procesos para medir el informe por trozos.
+    * @return lista de resultados (diccionarios).
+    */"""
+    resultados = []
+    for ventas in tamanos:
+        carpeta = os.path.join(carpeta_base, f"ventas_{ventas}")
+        inicio = time.perf_counter()
+        filas = generar_datos.generar(carpeta, ventas)
+        print(f"Datos de {ventas} ventas generados en {time.perf_counter() - inicio:.1f} s")
+        app.usar_carpeta_datos(carpeta)
+        for nombre, funcion, preparar in operaciones(consultas, altas):
+            mejor, media = medir(funcion, repeticiones, preparar)
+            resultados.append({
+                'ventas': ventas,
+                'clientes': filas['clientes'],
+                'eventos': filas['eventos'],
+                'operacion': nombre,
+                'repeticiones': repeticiones,
+                'mejor_s': round(mejor, 6),
+                'media_s': round(media, 6),
+            })
+            print(f"  {nombre:<32} mejor {mejor:.4f} s  media {media:.4f} s")
+        for procesos, mejor, media, identico in medir_escalado(escalado or [], repeticiones):
+            nombre = f'informe_por_trozos_p{procesos}'
+            resultados.append({
+                'ventas': ventas,
+                'clientes': filas['clientes'],
+                'eventos': filas['eventos'],
+                'operacion': nombre,
+                'repeticiones': repeticiones,
+                'mejor_s': round(mejor, 6),
+                'media_s': round(media, 6),
+                'identico': identico,
+            })
+            aviso = "" if identico else "  (distinto del informe en memoria)"
+            print(f"  {nombre:<32} mejor {mejor:.4f} s  media {media:.4f} s{aviso}")
+    return resultados
+
+
+def bytes_por_registro(clase, crear_argumentos, cantidad):
+    """/**
+    * Mide con tracemalloc cuanta memoria ocupa cada objeto creado, contando
+    * tambien sus valores.
+    * @param clase clase a instanciar.
+    * @param crear_argumentos funcion numero -> tupla de argumentos.
+    * @param cantidad objetos que se crean para hacer la media.
+    * @return bytes por objeto.
+    */"""
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        objetos = [clase(*crear_argumentos(numero)) for numero in range(cantidad)]
+        despues = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objetos
+    return (despues - antes) / cantidad
+
+
+def sin_slots(clase):
+    """/**
+    * Crea una copia de la clase con el mismo __init__ pero sin __slots__,
+    * es decir, como eran los modelos antes (con __dict__ por objeto).
+    * @param clase clase con __slots__.
+    * @return clase equivalente sin __slots__.
+    */"""
+    return type(clase.__name__ + "ConDict", (), {'__init__': clase.__init__})
+
+
+def informe_memoria(cantidad):
+    """/**
+    * Compara los bytes por registro de los modelos con __slots__ frente a la
+    * version con __dict__, para practicaFinal y practica03.
+    * @param cantidad objetos que se crean por modelo.
+    * @return lista de resultados (diccionarios).
+    */"""
+    base = date(2024, 1, 1)
+    modelos = [
+        (app.Cliente, lambda n: (n, f"Cliente {n}", f"c{n}@example.com", base + timedelta(days=n % 900))),
+        (app.Evento, lambda n: (n, f"Evento {n}", "Fiesta", base + timedelta(days=n % 900), float(n % 200))),
+        (app.Venta, lambda n: (n, n % 1000, n % 50, n % 6 + 1, float(n) * 1.5, base + timedelta(days=n % 900))),
+        (practica03.RegistroHorario, lambda n: (f"Empleado {n}", "Lunes", n % 12, n % 12 + 8)),
+        (practica03.Empleado, lambda n: (f"Empleado {n}",)),
+    ]
+    resultados = []
+    for clase, crear_argumentos in modelos:
+        antes = bytes_por_registro(sin_slots(clase), crear_argumentos, cantidad)
+        despues = bytes_por_registro(clase, crear_argumentos, cantidad)
+        resultados.append({
+            'modelo': clase.__name__,
+            'bytes_con_dict': round(antes, 1),
+            'bytes_con_slots': round(despues, 1),
+        })
+        print(f"  {clase.__name__:<16} {antes:7.1f} -> {despues:7.1f} bytes por registro")
+
+    columnas = app.AlmacenVentas()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        for numero in range(cantidad):
+            columnas.append(app.Venta(*modelos[2][1](numero)))
+        despues = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    resultados.append({'modelo': 'AlmacenVentas', 'bytes_con_slots': round((despues - antes) / cantidad, 1)})
+    print(f"  {'AlmacenVentas':<16} {(despues - antes) / cantidad:7.1f} bytes por venta")
+
+    horarios = practica03.AlmacenRegistros()
+    dias = practica03.DIAS
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        for numero in range(cantidad):
+            horarios.agregar(f"Empleado {numero % 1000}", dias[numero % 7], numero % 12, numero % 12 + 8)
+        despues = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    resultados.append({'modelo': 'AlmacenRegistros', 'bytes_con_slots': round((despues - antes) / cantidad, 1)})
+    print(f"  {'AlmacenRegistros':<16} {(despues - antes) / cantidad:7.1f} bytes por registro (1000 empleados)")
+    return resultados
+
+
+def comparar(anterior, actual):
+    """/**
+    * Enseña cuanto ha cambiado cada operacion respecto a otra ejecucion.
+    * @param anterior resultados cargados del JSON de referencia.
+    * @param actual resultados de esta ejecucion.
+    * @return None
+    */"""
+    if anterior.get('version_datos', 1) != actual['version_datos']:
+        print("No se compara: los datos de referencia son de otra version de generar_datos.py")
+        return
+    referencia = {(r['ventas'], r['operacion']): r['mejor_s'] for r in anterior['resultados']}
+    print(f"Comparado con {anterior.get('commit') or 'referencia'}:")
+    for resultado in actual['resultados']:
+        clave = (resultado['ventas'], resultado['operacion'])
+        if clave not in referencia or not resultado['mejor_s']:
+            continue
+        factor = referencia[clave] / resultado['mejor_s']
+        print(f"  {resultado['ventas']:>9} {resultado['operacion']:<32} x{factor:.2f}")
+
+
+def main():
+    """/**
+    * Lee los parametros, lanza las mediciones y guarda el JSON.
+    * @return None
+    */"""
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de practicaFinal.py")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000],
+                        help="numeros de ventas a probar")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--consultas', type=int, default=100, help="rangos de fechas por repeticion")
+    parser.add_argument('--altas', type=int, default=1000, help="clientes dados de alta por repeticion")
+    parser.add_argument('--carpeta', help="carpeta para los datos generados (por defecto una temporal)")
+    parser.add_argument('--salida', default='benchmark.json', help="fichero JSON de resultados")
+    parser.add_argument('--comparar', help="JSON de otra ejecucion para comparar")
+    parser.add_argument('--escalado', type=int, nargs='+', metavar='P',
+                        help="mide el informe por trozos con estos numeros de procesos")
+    parser.add_argument('--memoria', type=int, metavar='N',
+                        help="mide ademas los bytes por registro de los modelos con N objetos")
+    args = parser.parse_args()
+
+    memoria = None
+    if args.memoria:
+        print(f"Memoria por registro ({args.memoria} objetos):")
+        memoria = informe_memoria(args.memoria)
+
+    carpeta = args.carpeta or tempfile.mkdtemp(prefix="bench_practica_")
+    try:
+        resultados = ejecutar(args.tamanos, args.repeticiones, args.consultas, args.altas, carpeta,
+                              args.escalado)
+    finally:
+        if not args.carpeta:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    informe = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'version_datos': generar_datos.VERSION_DATOS,
+        'resultados': resultados,
+    }
+    if memoria is not None:
+        informe['memoria'] = memoria
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2)
+    print("Resultados guardados en", args.salida)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), informe)
+
+
+if __name__ == '__main__':
+    main()
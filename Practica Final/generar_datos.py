@@ -0,0 +1,111 @@
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+# /** Categorias que se reparten entre los eventos generados. */
+CATEGORIAS = ["Fiesta", "Formacion", "Concierto", "Teatro", "Deporte", "Feria"]
+# /** Nombres y apellidos con los que se montan los clientes. */
+NOMBRES = ["Maria", "Miquel", "Pepe", "Laura", "Joan", "Ana", "Marta", "Jordi", "Lucia", "Pau"]
+APELLIDOS = ["Garcia", "Perez", "Lopez", "Martinez", "Puig", "Soler", "Vidal", "Ruiz", "Serra", "Roca"]
+# /** Primer dia del periodo de fechas generado. */
+FECHA_INICIO = date(2022, 1, 1)
+# /** Numero de dias del periodo de fechas generado. */
+DIAS_PERIODO = 3 * 365
+# /**
+#  * Version de los datos generados: sube cuando la misma semilla deja de dar
+#  * los mismos ficheros (la 2 tiene precios con medios centimos).
+#  */
+VERSION_DATOS = 2
+
+
+def tamanos_por_defecto(ventas):
+    """/**
+    * Calcula cuantos clientes y eventos tiene sentido generar para un
+    * numero de ventas dado.
+    * @param ventas numero de ventas.
+    * @return tupla (clientes, eventos).
+    */"""
+    return max(ventas // 10, 10), max(ventas // 1000, 10)
+
+
+def generar(carpeta, ventas, clientes=None, eventos=None, semilla=1234, sucias=0.0):
+    """/**
+    * Escribe clientes.csv, eventos.csv y ventas.csv en la carpeta indicada.
+    * Con la misma semilla siempre genera exactamente los mismos ficheros.
+    * @param carpeta carpeta de salida (se crea si no existe).
+    * @param ventas numero de ventas.
+    * @param clientes numero de clientes (por defecto ventas / 10).
+    * @param eventos numero de eventos (por defecto ventas / 1000).
+    * @param semilla semilla del generador aleatorio.
+    * @param sucias fraccion de filas de ventas que se escriben con errores.
+    * @return diccionario con el numero de filas de cada fichero.
+    */"""
+    por_defecto = tamanos_por_defecto(ventas)
+    clientes = clientes or por_defecto[0]
+    eventos = eventos or por_defecto[1]
+    azar = random.Random(semilla)
+    os.makedirs(carpeta, exist_ok=True)
+    fechas = [(FECHA_INICIO + timedelta(days=i)).isoformat() for i in range(DIAS_PERIODO)]
+
+    with open(os.path.join(carpeta, "clientes.csv"), 'w', newline='', encoding='utf-8',
+              buffering=1024 * 1024) as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['id', 'nombre', 'email', 'fecha_alta'])
+        for id_cliente in range(1, clientes + 1):
+            nombre = azar.choice(NOMBRES)
+            apellido = azar.choice(APELLIDOS)
+            escritor.writerow([id_cliente, f"{nombre} {apellido}",
+                               f"{nombre.lower()}.{apellido.lower()}{id_cliente}@example.com",
+                               azar.choice(fechas)])
+
+    precios = []
+    with open(os.path.join(carpeta, "eventos.csv"), 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['id', 'nombre', 'categoria', 'fecha', 'precio'])
+        for id_evento in range(1, eventos + 1):
+            categoria = azar.choice(CATEGORIAS)
+            precio = azar.randrange(2000, 40000) / 200
+            precios.append(precio)
+            escritor.writerow([id_evento, f"{categoria} {id_evento}", categoria,
+                               azar.choice(fechas), precio])
+
+    with open(os.path.join(carpeta, "ventas.csv"), 'w', newline='', encoding='utf-8',
+              buffering=1024 * 1024) as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['id', 'cliente_id', 'evento_id', 'cantidad', 'total', 'fecha'])
+        for id_venta in range(1, ventas + 1):
+            if sucias and azar.random() < sucias:
+                escritor.writerow([id_venta, 'x', '', '', '', 'sin-fecha'])
+                continue
+            evento_id = azar.randint(1, eventos)
+            cantidad = azar.randint(1, 6)
+            escritor.writerow([id_venta, azar.randint(1, clientes), evento_id, cantidad,
+                               cantidad * precios[evento_id - 1], azar.choice(fechas)])
+
+    return {'clientes': clientes, 'eventos': eventos, 'ventas': ventas}
+
+
+def main():
+    """/**
+    * Lee los parametros de la linea de comandos y genera los CSV.
+    * @return None
+    */"""
+    parser = argparse.ArgumentParser(description="Genera datos de prueba para practicaFinal.py")
+    parser.add_argument('carpeta', help="carpeta donde se escriben los CSV")
+    parser.add_argument('--ventas', type=int, default=10000, help="numero de ventas")
+    parser.add_argument('--clientes', type=int, help="numero de clientes (por defecto ventas / 10)")
+    parser.add_argument('--eventos', type=int, help="numero de eventos (por defecto ventas / 1000)")
+    parser.add_argument('--semilla', type=int, default=1234, help="semilla aleatoria")
+    parser.add_argument('--sucias', type=float, default=0.0,
+                        help="fraccion de ventas que se escriben con errores")
+    args = parser.parse_args()
+
+    filas = generar(args.carpeta, args.ventas, args.clientes, args.eventos, args.semilla, args.sucias)
+    print(f"Generados {filas['clientes']} clientes, {filas['eventos']} eventos "
+          f"y {filas['ventas']} ventas en {args.carpeta}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,25 @@
+import argparse
+import atexit
+import cProfile
 import csv
+import io
+import json
+import math
+import mmap
 import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, date
+from functools import wraps
+from itertools import islice
 
 # /**
 #  * Diccionario en memoria con los clientes indexados por id.
@@ -11,9 +30,66 @@ clientes = {}
 #  */
 eventos = {}
 # /**
-#  * Lista con todas las ventas cargadas desde el CSV.
+#  * Almacen por columnas con todas las ventas cargadas desde el CSV.
 #  */
-ventas = []
+ventas = None
+# /**
+#  * Indice de las ventas ordenado por fecha para consultas por rango.
+#  */
+indice_fechas = None
+# /**
+#  * Totales por evento que se mantienen al dia con las ventas.
+#  */
+agregados = None
+# /**
+#  * Indices de ventas por cliente y por evento (posiciones en el almacen).
+#  */
+indice_clientes = None
+indice_eventos = None
+# /**
+#  * Totales diarios acumulados para resumenes por rango de fechas.
+#  */
+rollup = None
+# /**
+#  * Indices de clientes por email y por nombre.
+#  */
+busqueda_clientes = None
+# /**
+#  * Eventos ordenados por fecha para buscar los proximos.
+#  */
+agenda_eventos = None
+# /**
+#  * Funcion que devuelve la fecha de hoy (se puede cambiar con fijar_reloj).
+#  */
+_reloj = date.today
+# /**
+#  * Contador persistente de ids de clientes (se crea al usarlo).
+#  */
+secuencia_clientes = None
+# /**
+#  * Fechas ya convertidas por parse_fecha_rapida, por texto original.
+#  */
+_cache_fechas = {}
+# /**
+#  * Filas rechazadas en la ultima llamada a cargar_datos.
+#  */
+informe_errores = None
+# /**
+#  * Procesos para calcular el informe por trozos del CSV (0 = desde memoria).
+#  */
+procesos_informe = 0
+# /**
+#  * Escritor que agrupa las altas de clientes (se crea al usarlo).
+#  */
+escritor_clientes = None
+# /**
+#  * Version de los datos en memoria; sube cada vez que cambian.
+#  */
+version_datos = 0
+# /**
+#  * Base de datos SQLite en uso (None = modo CSV en memoria, el normal).
+#  */
+base_datos = None
 
 # /** Ruta al CSV de clientes. */
 CLIENTES_FILE = "Practica Final/data/clientes.csv"
@@ -23,6 +99,288 @@ EVENTOS_FILE = "Practica Final/data/eventos.csv"
 VENTAS_FILE = "Practica Final/data/ventas.csv"
 # /** Ruta de salida para el informe resumido. */
 INFORME_FILE = "Practica Final/data/informe_resumen.csv"
+# /** Fichero con el ultimo id de cliente entregado. */
+SECUENCIA_CLIENTES_FILE = "Practica Final/data/clientes.seq"
+# /** Copia binaria de los datos ya convertidos para arrancar sin leer los CSV. */
+CACHE_FILE = "Practica Final/data/datos.cache"
+# /** Base de datos SQLite que se usa con --sqlite si no se da otra ruta. */
+SQLITE_FILE = "Practica Final/data/datos.db"
+# /** Cabecera que identifica el formato del fichero de cache. */
+MAGIA_CACHE = b"PFCACHE2"
+# /** Filas que se convierten y se añaden de cada vez al cargar un CSV. */
+TAM_BLOQUE_VENTAS = 50000
+# /** Fechas distintas que se recuerdan como maximo en parse_fecha_rapida. */
+LIMITE_CACHE_FECHAS = 100000
+# /** Filas por pagina al listar una tabla por el menu. */
+TAM_PAGINA = 50
+# /** Lineas que se juntan en cada escritura al listar o exportar tablas. */
+LINEAS_POR_BLOQUE = 10000
+# /** Bytes a partir de los cuales cargar_datos usa procesos en vez de hilos. */
+UMBRAL_CARGA_PROCESOS = 8 * 1024 * 1024
+# /** Resultados de consultas que se recuerdan como maximo. */
+TAM_CACHE_CONSULTAS = 128
+# /** Filas que se recuerdan como maximo entre todos los resultados guardados. */
+FILAS_CACHE_CONSULTAS = 100000
+
+
+def usar_carpeta_datos(carpeta):
+    """/**
+    * Cambia todas las rutas de datos para trabajar con otra carpeta
+    * (por ejemplo datos generados para pruebas de rendimiento).
+    * @param carpeta carpeta con clientes.csv, eventos.csv y ventas.csv.
+    * @return None
+    */"""
+    global CLIENTES_FILE, EVENTOS_FILE, VENTAS_FILE, INFORME_FILE
+    global SECUENCIA_CLIENTES_FILE, CACHE_FILE, SQLITE_FILE
+    CLIENTES_FILE = os.path.join(carpeta, "clientes.csv")
+    EVENTOS_FILE = os.path.join(carpeta, "eventos.csv")
+    VENTAS_FILE = os.path.join(carpeta, "ventas.csv")
+    INFORME_FILE = os.path.join(carpeta, "informe_resumen.csv")
+    SECUENCIA_CLIENTES_FILE = os.path.join(carpeta, "clientes.seq")
+    CACHE_FILE = os.path.join(carpeta, "datos.cache")
+    SQLITE_FILE = os.path.join(carpeta, "datos.db")
+
+
+def fecha_hoy():
+    """/**
+    * Fecha de hoy segun el reloj del programa. Todo el codigo pregunta aqui
+    * en vez de llamar a date.today(), asi se puede fijar un dia concreto.
+    * @return date de hoy.
+    */"""
+    return _reloj()
+
+
+def fijar_reloj(reloj=None):
+    """/**
+    * Cambia el reloj del programa.
+    * @param reloj funcion sin argumentos que devuelve un date, o una fecha
+    * fija; None vuelve a usar la fecha del sistema.
+    * @return None
+    */"""
+    global _reloj
+    if reloj is None:
+        _reloj = date.today
+    elif isinstance(reloj, date):
+        _reloj = lambda: reloj
+    else:
+        _reloj = reloj
+
+
+class _SinMedida:
+    """/**
+    * Medida vacia que se usa cuando las metricas estan apagadas.
+    */"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+
+_SIN_MEDIDA = _SinMedida()
+
+
+class _Medida:
+    """/**
+    * Cronometra un bloque with y apunta el tiempo en las metricas.
+    * @param metricas objeto Metricas donde se apunta.
+    * @param nombre nombre de la etapa.
+    */"""
+    __slots__ = ('metricas', 'nombre', 'inicio')
+
+    def __init__(self, metricas, nombre):
+        self.metricas = metricas
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.metricas.anotar_tiempo(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+class Metricas:
+    """/**
+    * Tiempos y contadores de cada etapa del programa (carga, filtros,
+    * estadisticas, informe). Apagadas por defecto: asi cada medida solo
+    * cuesta comprobar el atributo activo.
+    */"""
+    def __init__(self):
+        self.activo = False
+        self.contadores = {}
+        self.tiempos = {}
+
+    def contar(self, nombre, cantidad=1):
+        """/**
+        * Suma una cantidad a un contador.
+        * @param nombre nombre del contador.
+        * @param cantidad valor a sumar.
+        * @return None
+        */"""
+        if self.activo:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def anotar_tiempo(self, nombre, segundos):
+        """/**
+        * Apunta una ejecucion de una etapa (veces, total y maximo).
+        * @param nombre nombre de la etapa.
+        * @param segundos lo que ha tardado.
+        * @return None
+        */"""
+        if not self.activo:
+            return
+        datos = self.tiempos.get(nombre)
+        if datos is None:
+            self.tiempos[nombre] = [1, segundos, segundos]
+        else:
+            datos[0] += 1
+            datos[1] += segundos
+            if segundos > datos[2]:
+                datos[2] = segundos
+
+    def medir(self, nombre):
+        """/**
+        * @param nombre nombre de la etapa.
+        * @return objeto para usar con with que cronometra el bloque.
+        */"""
+        if not self.activo:
+            return _SIN_MEDIDA
+        return _Medida(self, nombre)
+
+    def como_dict(self):
+        """/**
+        * @return diccionario con contadores y tiempos, listo para JSON.
+        */"""
+        tiempos = {nombre: {'veces': veces, 'segundos': round(total, 6), 'maximo': round(maximo, 6)}
+                   for nombre, (veces, total, maximo) in self.tiempos.items()}
+        return {'contadores': dict(self.contadores), 'tiempos': tiempos}
+
+    def texto_prometheus(self):
+        """/**
+        * @return las metricas en el formato de texto de Prometheus.
+        */"""
+        lineas = ["# TYPE practica_contador counter"]
+        for nombre, valor in self.contadores.items():
+            lineas.append(f'practica_contador{{nombre="{nombre}"}} {valor}')
+        series = (('practica_etapa_veces', 'counter', 0, '{}'),
+                  ('practica_etapa_segundos', 'counter', 1, '{:.6f}'),
+                  ('practica_etapa_segundos_max', 'gauge', 2, '{:.6f}'))
+        for metrica, tipo, posicion, formato in series:
+            lineas.append(f"# TYPE {metrica} {tipo}")
+            for nombre, datos in self.tiempos.items():
+                lineas.append(f'{metrica}{{etapa="{nombre}"}} ' + formato.format(datos[posicion]))
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta):
+        """/**
+        * Guarda las metricas en un fichero: JSON si acaba en .json y texto
+        * de Prometheus en otro caso.
+        * @param ruta fichero de salida.
+        * @return None
+        */"""
+        with open(ruta, 'w', encoding='utf-8') as f:
+            if ruta.endswith('.json'):
+                json.dump(self.como_dict(), f, indent=2)
+                f.write("\n")
+            else:
+                f.write(self.texto_prometheus())
+
+
+# /**
+#  * Metricas del programa (se encienden con --metricas).
+#  */
+metricas = Metricas()
+
+
+def medido(nombre):
+    """/**
+    * Decorador que cronometra cada llamada a la funcion como una etapa.
+    * @param nombre nombre de la etapa en las metricas.
+    * @return decorador.
+    */"""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltorio(*args, **kwargs):
+            if not metricas.activo:
+                return funcion(*args, **kwargs)
+            with _Medida(metricas, nombre):
+                return funcion(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+class CacheConsultas:
+    """/**
+    * Cache LRU de resultados de consultas, por parametros. Cada resultado
+    * se guarda con la version de los datos con la que se calculo; si los
+    * datos han cambiado desde entonces la cache se vacia entera.
+    * Ademas del numero de resultados se limita el total de filas (len de
+    * cada resultado), para que unos pocos rangos grandes no llenen la
+    * memoria; un resultado con mas filas que el limite no se guarda.
+    * @param capacidad resultados que se guardan como maximo.
+    * @param max_filas filas que se guardan como maximo entre todos.
+    */"""
+    def __init__(self, capacidad=TAM_CACHE_CONSULTAS, max_filas=FILAS_CACHE_CONSULTAS):
+        self.capacidad = capacidad
+        self.max_filas = max_filas
+        self.resultados = OrderedDict()
+        self.filas = 0
+        self.version = None
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, calcular):
+        """/**
+        * Devuelve el resultado guardado para la clave o lo calcula y lo guarda,
+        * quitando el usado hace mas tiempo si ya no cabe.
+        * @param clave tupla con el nombre de la consulta y sus parametros.
+        * @param calcular funcion sin argumentos que calcula el resultado
+        *        (una secuencia, que no se debe modificar despues).
+        * @return el resultado de la consulta.
+        */"""
+        if self.version != version_datos:
+            self.resultados.clear()
+            self.filas = 0
+            self.version = version_datos
+        try:
+            resultado = self.resultados[clave]
+        except KeyError:
+            self.fallos += 1
+            metricas.contar("cache_consultas.fallos")
+            resultado = calcular()
+            if len(resultado) > self.max_filas:
+                return resultado
+            self.resultados[clave] = resultado
+            self.filas += len(resultado)
+            while len(self.resultados) > self.capacidad or self.filas > self.max_filas:
+                _, quitado = self.resultados.popitem(last=False)
+                self.filas -= len(quitado)
+            return resultado
+        self.aciertos += 1
+        metricas.contar("cache_consultas.aciertos")
+        self.resultados.move_to_end(clave)
+        return resultado
+
+
+# /**
+#  * Resultados recientes de ventas_en_rango y estadisticas.
+#  */
+cache_consultas = CacheConsultas()
+
+
+def nueva_version_datos():
+    """/**
+    * Marca que los datos en memoria han cambiado, para que la cache de
+    * consultas no devuelva resultados antiguos.
+    * @return None
+    */"""
+    global version_datos
+    version_datos += 1
+
 
 class Cliente:
     """/**
@@ -32,6 +390,8 @@ class Cliente:
     * @param email correo electronico validado basico.
     * @param fecha_alta fecha en la que se dio de alta.
     */"""
+    __slots__ = ('id', 'nombre', 'email', 'fecha_alta')
+
     def __init__(self, id_cliente, nombre, email, fecha_alta):
         self.id = id_cliente
         self.nombre = nombre
@@ -43,7 +403,7 @@ class Cliente:
         * Calcula cuantos dias han pasado desde la fecha de alta.
         * @return numero de dias como entero.
         */"""
-        return (date.today() - self.fecha_alta).days
+        return (fecha_hoy() - self.fecha_alta).days
 
     def __str__(self):
         return f"{self.id} - {self.nombre} ({self.email}) alta {self.fecha_alta}"
@@ -58,6 +418,8 @@ class Evento:
     * @param fecha fecha del evento como date.
     * @param precio precio unitario en euros.
     */"""
+    __slots__ = ('id', 'nombre', 'categoria', 'fecha', 'precio')
+
     def __init__(self, id_evento, nombre, categoria, fecha, precio):
         self.id = id_evento
         self.nombre = nombre
@@ -65,15 +427,24 @@ class Evento:
         self.fecha = fecha
         self.precio = precio
 
-    def dias_hasta_evento(self):
+    def dias_hasta_evento(self, hoy=None):
         """/**
         * Calcula cuantos dias faltan para la fecha del evento.
+        * @param hoy fecha de referencia; si no se pasa se usa la de hoy.
         * @return dias restantes (puede ser negativo si ya paso).
         */"""
-        return (self.fecha - date.today()).days
+        return (self.fecha - (hoy or fecha_hoy())).days
+
+    def texto(self, hoy=None):
+        """/**
+        * Texto del evento para listados, con los dias que faltan respecto a hoy.
+        * @param hoy fecha de referencia, para no pedir la fecha por cada evento.
+        * @return cadena con los datos del evento.
+        */"""
+        return f"{self.id} - {self.nombre} [{self.categoria}] {self.fecha} precio {self.precio} (faltan {self.dias_hasta_evento(hoy)} dias)"
 
     def __str__(self):
-        return f"{self.id} - {self.nombre} [{self.categoria}] {self.fecha} precio {self.precio} (faltan {self.dias_hasta_evento()} dias)"
+        return self.texto()
 
 
 class Venta:
@@ -86,6 +457,8 @@ class Venta:
     * @param total importe total de la venta.
     * @param fecha fecha de la venta.
     */"""
+    __slots__ = ('id', 'cliente_id', 'evento_id', 'cantidad', 'total', 'fecha')
+
     def __init__(self, id_venta, cliente_id, evento_id, cantidad, total, fecha):
         self.id = id_venta
         self.cliente_id = cliente_id
@@ -98,6 +471,539 @@ class Venta:
         return f"Venta {self.id} cliente {self.cliente_id} evento {self.evento_id} total {self.total} fecha {self.fecha}"
 
 
+class AlmacenVentas:
+    """/**
+    * Guarda las ventas por columnas en arrays contiguos en vez de un objeto
+    * Venta por fila. Se comporta como una lista de ventas: admite len, for,
+    * indices y append, y crea el objeto Venta solo cuando se pide.
+    * Las fechas se guardan como ordinal (date.toordinal) y bytes_leidos
+    * apunta hasta donde se ha leido ventas.csv, para seguir leyendo despues;
+    * filas_leidas cuenta las filas de datos leidas (tambien las rechazadas).
+    */"""
+    COLUMNAS = ('ids', 'cliente_ids', 'evento_ids', 'cantidades', 'totales', 'fechas')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.cliente_ids = array('q')
+        self.evento_ids = array('q')
+        self.cantidades = array('q')
+        self.totales = array('d')
+        self.fechas = array('i')
+        self.bytes_leidos = 0
+        self.filas_leidas = 0
+
+    def agregar_fila(self, id_venta, cliente_id, evento_id, cantidad, total, fecha):
+        """/**
+        * Añade una venta al final de las columnas sin crear el objeto Venta.
+        * @param fecha fecha de la venta como date.
+        * @return None
+        */"""
+        self.ids.append(id_venta)
+        self.cliente_ids.append(cliente_id)
+        self.evento_ids.append(evento_id)
+        self.cantidades.append(cantidad)
+        self.totales.append(total)
+        self.fechas.append(fecha.toordinal())
+
+    def append(self, venta):
+        """/**
+        * Añade un objeto Venta al almacen.
+        * @param venta venta a guardar.
+        * @return None
+        */"""
+        self.agregar_fila(venta.id, venta.cliente_id, venta.evento_id,
+                          venta.cantidad, venta.total, venta.fecha)
+
+    def extender(self, ids, cliente_ids, evento_ids, cantidades, totales, fechas):
+        """/**
+        * Añade un bloque de ventas ya convertidas, una lista por columna.
+        * @param fechas fechas como ordinal.
+        * @return None
+        */"""
+        self.ids.extend(ids)
+        self.cliente_ids.extend(cliente_ids)
+        self.evento_ids.extend(evento_ids)
+        self.cantidades.extend(cantidades)
+        self.totales.extend(totales)
+        self.fechas.extend(fechas)
+
+    def venta(self, i):
+        """/**
+        * Construye el objeto Venta de la fila indicada.
+        * @param i posicion de la venta.
+        * @return objeto Venta.
+        */"""
+        return Venta(self.ids[i], self.cliente_ids[i], self.evento_ids[i],
+                     self.cantidades[i], self.totales[i], date.fromordinal(self.fechas[i]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.venta(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self.venta(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.venta(i)
+
+
+class IndiceFechas:
+    """/**
+    * Indice ordenado por fecha sobre el almacen de ventas.
+    * Guarda las fechas ordenadas y, en paralelo, la posicion de cada venta
+    * en el almacen, para resolver rangos con busqueda binaria.
+    * @param almacen ventas sobre las que se construye el indice.
+    */"""
+    def __init__(self, almacen):
+        self.ventas = almacen
+        self.posiciones = array('q')
+        self.fechas = array('i')
+        self.actualizar()
+
+    def actualizar(self):
+        """/**
+        * Incorpora al indice las ventas añadidas al almacen desde la ultima
+        * llamada. La primera vez ordena todo de golpe; despues inserta cada
+        * venta nueva en su sitio (al final si es la mas reciente).
+        * @return None
+        */"""
+        desde = len(self.posiciones)
+        columna = self.ventas.fechas
+        if desde == 0:
+            orden = sorted(range(len(columna)), key=columna.__getitem__)
+            self.posiciones = array('q', orden)
+            self.fechas = array('i', [columna[i] for i in orden])
+            return
+        for i in range(desde, len(columna)):
+            fecha = columna[i]
+            if fecha >= self.fechas[-1]:
+                self.fechas.append(fecha)
+                self.posiciones.append(i)
+            else:
+                hueco = bisect_right(self.fechas, fecha)
+                self.fechas.insert(hueco, fecha)
+                self.posiciones.insert(hueco, i)
+
+    def rango(self, fecha_inicio, fecha_fin):
+        """/**
+        * Busca las ventas con fecha entre dos fechas (ambas incluidas).
+        * @param fecha_inicio primera fecha del rango.
+        * @param fecha_fin ultima fecha del rango.
+        * @return lista de ventas ordenadas por fecha.
+        */"""
+        desde = bisect_left(self.fechas, fecha_inicio.toordinal())
+        hasta = bisect_right(self.fechas, fecha_fin.toordinal())
+        return [self.ventas.venta(i) for i in self.posiciones[desde:hasta]]
+
+
+class SumaExacta:
+    """/**
+    * Suma de decimales sin errores de redondeo que dependan del orden: se
+    * guardan sumas parciales que no se solapan (algoritmo de Shewchuk, el
+    * mismo que usa math.fsum) y el valor final se redondea una sola vez.
+    * Dos sumas se pueden juntar sin perder precision, asi el resultado es
+    * el mismo se sume en el orden que se sume (por ejemplo por trozos).
+    * Tambien sirve como funcion de agregado de sqlite3 (step / finalize).
+    * @param parciales sumas parciales de otra SumaExacta (opcional).
+    */"""
+    __slots__ = ('parciales',)
+
+    def __init__(self, parciales=None):
+        self.parciales = list(parciales) if parciales else []
+
+    def agregar(self, valor):
+        """/**
+        * Suma un valor.
+        * @param valor numero a sumar.
+        * @return None
+        */"""
+        parciales = self.parciales
+        usados = 0
+        for parcial in parciales:
+            if abs(valor) < abs(parcial):
+                valor, parcial = parcial, valor
+            alto = valor + parcial
+            bajo = parcial - (alto - valor)
+            if bajo:
+                parciales[usados] = bajo
+                usados += 1
+            valor = alto
+        parciales[usados:] = [valor]
+
+    def unir(self, otra):
+        """/**
+        * Suma a esta todos los valores de otra SumaExacta.
+        * @param otra SumaExacta a añadir.
+        * @return None
+        */"""
+        for parcial in otra.parciales:
+            self.agregar(parcial)
+
+    def valor(self):
+        """/**
+        * @return la suma exacta redondeada al float mas cercano.
+        */"""
+        return math.fsum(self.parciales)
+
+    step = agregar
+    finalize = valor
+
+
+class AgregadosVentas:
+    """/**
+    * Totales de ventas que se mantienen al dia segun se cargan o se añaden
+    * ventas, para que los informes no tengan que recorrer todas las ventas.
+    * Los ingresos se suman con SumaExacta, asi coinciden con los del
+    * informe por trozos y con los de SQLite.
+    * Los diccionarios por evento siguen el orden de aparicion de los eventos.
+    * @param almacen ventas de las que se calculan los totales.
+    */"""
+    def __init__(self, almacen):
+        self.ventas = almacen
+        self.procesadas = 0
+        self.sumas_evento = {}
+        self.ingresos_totales = 0.0
+        self.ingresos_evento = {}
+        self.unidades_evento = {}
+        self.actualizar()
+
+    def actualizar(self):
+        """/**
+        * Suma a los totales las ventas que aun no se habian contado.
+        * @return None
+        */"""
+        desde = self.procesadas
+        if desde >= len(self.ventas):
+            return
+        sumas_evento = self.sumas_evento
+        unidades_evento = self.unidades_evento
+        columnas = zip(self.ventas.evento_ids[desde:], self.ventas.totales[desde:],
+                       self.ventas.cantidades[desde:])
+        for evento_id, total, cantidad in columnas:
+            suma = sumas_evento.get(evento_id)
+            if suma is None:
+                suma = sumas_evento[evento_id] = SumaExacta()
+                unidades_evento[evento_id] = 0
+            suma.agregar(total)
+            unidades_evento[evento_id] += cantidad
+        self.ingresos_evento = {evento_id: suma.valor() for evento_id, suma in sumas_evento.items()}
+        self.ingresos_totales = math.fsum(parcial for suma in sumas_evento.values() for parcial in suma.parciales)
+        self.procesadas = len(self.ventas)
+
+
+class IndicePorColumna:
+    """/**
+    * Indice secundario de las ventas por el valor de una columna
+    * (por ejemplo cliente_ids o evento_ids). Para cada valor guarda las
+    * posiciones de sus ventas en el almacen, en orden de carga.
+    * @param almacen ventas a indexar.
+    * @param columna nombre del atributo de AlmacenVentas usado como clave.
+    */"""
+    def __init__(self, almacen, columna):
+        self.ventas = almacen
+        self.columna = columna
+        self.posiciones = {}
+        self.indexadas = 0
+        self.actualizar()
+
+    def actualizar(self):
+        """/**
+        * Añade al indice las ventas nuevas del almacen.
+        * @return None
+        */"""
+        valores = getattr(self.ventas, self.columna)
+        posiciones = self.posiciones
+        for i in range(self.indexadas, len(valores)):
+            clave = valores[i]
+            lista = posiciones.get(clave)
+            if lista is None:
+                posiciones[clave] = array('q', (i,))
+            else:
+                lista.append(i)
+        self.indexadas = len(valores)
+
+    def buscar(self, clave):
+        """/**
+        * @param clave valor buscado (id de cliente o de evento).
+        * @return array con las posiciones de sus ventas (vacio si no hay).
+        */"""
+        return self.posiciones.get(clave, array('q'))
+
+
+class SerieAcumulada:
+    """/**
+    * Totales diarios de ventas guardados como sumas acumuladas (prefijos):
+    * el total entre dos fechas sale de dos busquedas binarias y una resta.
+    * @param cubos diccionario ordinal del dia -> [ingresos, unidades].
+    */"""
+    def __init__(self, cubos):
+        self.dias = array('i', sorted(cubos))
+        self.ingresos = array('d', [0.0])
+        self.unidades = array('q', [0])
+        ingresos = 0.0
+        unidades = 0
+        for dia in self.dias:
+            ingresos += cubos[dia][0]
+            unidades += cubos[dia][1]
+            self.ingresos.append(ingresos)
+            self.unidades.append(unidades)
+
+    def total(self, fecha_inicio, fecha_fin):
+        """/**
+        * Suma ingresos y unidades entre dos fechas (ambas incluidas).
+        * @return tupla (ingresos, unidades).
+        */"""
+        desde = bisect_left(self.dias, fecha_inicio.toordinal())
+        hasta = bisect_right(self.dias, fecha_fin.toordinal())
+        if hasta <= desde:
+            return 0.0, 0
+        return (self.ingresos[hasta] - self.ingresos[desde],
+                self.unidades[hasta] - self.unidades[desde])
+
+
+class RollupVentas:
+    """/**
+    * Acumula las ventas por dia (en total y por categoria de evento) para
+    * responder totales por rango de fechas, por dia o por mes sin recorrer
+    * las ventas. Las ventas nuevas se suman a los cubos diarios y las sumas
+    * acumuladas se rehacen solo cuando se vuelven a consultar.
+    * @param almacen ventas a acumular.
+    * @param eventos_por_id eventos para saber la categoria de cada venta.
+    */"""
+    def __init__(self, almacen, eventos_por_id):
+        self.ventas = almacen
+        self.eventos = eventos_por_id
+        self.procesadas = 0
+        self.cubos = {}
+        self.cubos_categoria = {}
+        self.series = None
+        self.actualizar()
+
+    def actualizar(self):
+        """/**
+        * Suma a los cubos diarios las ventas que aun no se habian contado.
+        * @return None
+        */"""
+        desde = self.procesadas
+        if desde >= len(self.ventas):
+            return
+        categorias = {evento_id: evento.categoria for evento_id, evento in self.eventos.items()}
+        columnas = zip(self.ventas.fechas[desde:], self.ventas.evento_ids[desde:],
+                       self.ventas.totales[desde:], self.ventas.cantidades[desde:])
+        for dia, evento_id, total, cantidad in columnas:
+            cubo = self.cubos.get(dia)
+            if cubo is None:
+                cubo = self.cubos[dia] = [0.0, 0]
+            cubo[0] += total
+            cubo[1] += cantidad
+            categoria = categorias.get(evento_id, "?")
+            cubos = self.cubos_categoria.get(categoria)
+            if cubos is None:
+                cubos = self.cubos_categoria[categoria] = {}
+            cubo = cubos.get(dia)
+            if cubo is None:
+                cubo = cubos[dia] = [0.0, 0]
+            cubo[0] += total
+            cubo[1] += cantidad
+        self.procesadas = len(self.ventas)
+        self.series = None
+
+    def _series(self):
+        """/**
+        * Rehace las sumas acumuladas si ha habido ventas nuevas.
+        * @return diccionario categoria (None = todas) -> SerieAcumulada.
+        */"""
+        if self.series is None:
+            self.series = {None: SerieAcumulada(self.cubos)}
+            for categoria, cubos in self.cubos_categoria.items():
+                self.series[categoria] = SerieAcumulada(cubos)
+        return self.series
+
+    def totales(self, fecha_inicio, fecha_fin, categoria=None):
+        """/**
+        * Ingresos y unidades vendidos entre dos fechas.
+        * @param categoria categoria de evento o None para todas.
+        * @return tupla (ingresos, unidades).
+        */"""
+        serie = self._series().get(categoria)
+        if serie is None:
+            return 0.0, 0
+        return serie.total(fecha_inicio, fecha_fin)
+
+    def categorias(self):
+        """/**
+        * @return lista ordenada de categorias con ventas.
+        */"""
+        return sorted(self.cubos_categoria)
+
+    def por_dia(self, fecha_inicio, fecha_fin):
+        """/**
+        * Totales de cada dia con ventas entre dos fechas.
+        * @return lista de tuplas (fecha, ingresos, unidades).
+        */"""
+        serie = self._series()[None]
+        desde = bisect_left(serie.dias, fecha_inicio.toordinal())
+        hasta = bisect_right(serie.dias, fecha_fin.toordinal())
+        return [(date.fromordinal(dia), self.cubos[dia][0], self.cubos[dia][1])
+                for dia in serie.dias[desde:hasta]]
+
+    def por_mes(self, fecha_inicio, fecha_fin):
+        """/**
+        * Totales de cada mes con ventas entre dos fechas.
+        * @return lista de tuplas ('YYYY-MM', ingresos, unidades).
+        */"""
+        return sumar_por_mes(self.por_dia(fecha_inicio, fecha_fin))
+
+
+def sumar_por_mes(dias):
+    """/**
+    * Junta los totales diarios por mes.
+    * @param dias tuplas (fecha, ingresos, unidades) ordenadas por fecha.
+    * @return lista de tuplas ('YYYY-MM', ingresos, unidades).
+    */"""
+    meses = {}
+    for fecha, ingresos, unidades in dias:
+        clave = f"{fecha.year}-{fecha.month:02d}"
+        acumulado = meses.get(clave, (0.0, 0))
+        meses[clave] = (acumulado[0] + ingresos, acumulado[1] + unidades)
+    return [(mes, ingresos, unidades) for mes, (ingresos, unidades) in meses.items()]
+
+
+class AgendaEventos:
+    """/**
+    * Eventos ordenados por fecha (y por id a igual fecha) para saber cuales
+    * son los proximos con busqueda binaria, sin recorrerlos todos.
+    * @param eventos diccionario de eventos por id.
+    */"""
+    def __init__(self, eventos):
+        self.eventos = eventos
+        orden = sorted(eventos.values(), key=lambda evento: (evento.fecha, evento.id))
+        self.fechas = array('i', [evento.fecha.toordinal() for evento in orden])
+        self.orden = orden
+
+    def proximos(self, hoy, cantidad):
+        """/**
+        * @param hoy fecha de referencia.
+        * @param cantidad numero maximo de eventos.
+        * @return lista con los siguientes eventos desde hoy (incluido).
+        */"""
+        desde = bisect_left(self.fechas, hoy.toordinal())
+        return self.orden[desde:desde + cantidad]
+
+    def en_dias(self, hoy, dias):
+        """/**
+        * @param hoy fecha de referencia.
+        * @param dias dias a mirar hacia delante (0 = solo hoy).
+        * @return lista de eventos entre hoy y hoy + dias, por fecha.
+        */"""
+        desde = bisect_left(self.fechas, hoy.toordinal())
+        hasta = bisect_right(self.fechas, hoy.toordinal() + dias)
+        return self.orden[desde:hasta]
+
+
+def normalizar_texto(texto):
+    """/**
+    * Pasa un texto a minusculas, sin acentos y con un solo espacio entre
+    * palabras, para comparar y buscar nombres.
+    * @param texto cadena original.
+    * @return cadena normalizada.
+    */"""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    sin_acentos = ''.join(letra for letra in descompuesto if not unicodedata.combining(letra))
+    return ' '.join(sin_acentos.lower().split())
+
+
+def clave_email(email):
+    """/**
+    * Clave para comparar emails: sin espacios alrededor y en minusculas.
+    * No se quitan acentos, porque josé@x.com y jose@x.com son distintos.
+    * @param email cadena original.
+    * @return clave del email.
+    */"""
+    return email.strip().lower()
+
+
+class IndiceBusquedaClientes:
+    """/**
+    * Indices para buscar clientes sin recorrerlos todos:
+    * - emails: diccionario clave_email -> id, para comprobar en O(1)
+    *   si un email ya esta registrado.
+    * - nombres: lista ordenada de (texto normalizado, id) con una entrada por
+    *   cada palabra del nombre hasta el final ("maria garcia", "garcia"),
+    *   para buscar por prefijo con busqueda binaria.
+    * @param clientes_por_id diccionario de clientes indexado por id.
+    */"""
+    def __init__(self, clientes_por_id):
+        self.clientes = clientes_por_id
+        self.emails = {}
+        self.nombres = []
+        for cliente in clientes_por_id.values():
+            self.emails.setdefault(clave_email(cliente.email), cliente.id)
+            self.nombres.extend(self._entradas_nombre(cliente))
+        self.nombres.sort()
+
+    @staticmethod
+    def _entradas_nombre(cliente):
+        """/**
+        * @return lista de (texto, id) empezando en cada palabra del nombre.
+        */"""
+        palabras = normalizar_texto(cliente.nombre).split(' ')
+        return [(' '.join(palabras[i:]), cliente.id) for i in range(len(palabras))]
+
+    def agregar(self, cliente):
+        """/**
+        * Añade un cliente nuevo a los dos indices.
+        * @param cliente Cliente a añadir.
+        * @return None
+        */"""
+        self.emails.setdefault(clave_email(cliente.email), cliente.id)
+        for entrada in self._entradas_nombre(cliente):
+            insort(self.nombres, entrada)
+
+    def agregar_varios(self, nuevos):
+        """/**
+        * Añade muchos clientes de golpe reordenando la lista una sola vez.
+        * @param nuevos lista de objetos Cliente.
+        * @return None
+        */"""
+        for cliente in nuevos:
+            self.emails.setdefault(clave_email(cliente.email), cliente.id)
+            self.nombres.extend(self._entradas_nombre(cliente))
+        self.nombres.sort()
+
+    def id_por_email(self, email):
+        """/**
+        * @param email correo a buscar (da igual mayusculas o espacios).
+        * @return id del cliente con ese email o None.
+        */"""
+        return self.emails.get(clave_email(email))
+
+    def buscar_nombre(self, prefijo, limite=20):
+        """/**
+        * Busca clientes cuyo nombre (o alguna de sus palabras) empieza por el prefijo.
+        * @param prefijo texto escrito hasta ahora.
+        * @param limite numero maximo de resultados.
+        * @return lista de clientes ordenada por nombre.
+        */"""
+        prefijo = normalizar_texto(prefijo)
+        encontrados = []
+        vistos = set()
+        posicion = bisect_left(self.nombres, (prefijo,))
+        while posicion < len(self.nombres) and len(encontrados) < limite:
+            texto, id_cliente = self.nombres[posicion]
+            if not texto.startswith(prefijo):
+                break
+            if id_cliente not in vistos and id_cliente in self.clientes:
+                vistos.add(id_cliente)
+                encontrados.append(self.clientes[id_cliente])
+            posicion += 1
+        return encontrados
+
+
 def parse_fecha(texto):
     """/**
     * Convierte una cadena en formato YYYY-MM-DD a objeto date.
@@ -123,101 +1029,885 @@ def validar_email(texto):
     return True
 
 
+def parse_fecha_rapida(texto):
+    """/**
+    * Igual que parse_fecha pero mas rapida para cargas grandes: las fechas
+    * ya vistas salen de una cache y las que tienen forma YYYY-MM-DD se
+    * convierten con date.fromisoformat en vez de strptime.
+    * @param texto cadena con la fecha a parsear.
+    * @return fecha como objeto date.
+    */"""
+    fecha = _cache_fechas.get(texto)
+    if fecha is not None:
+        return fecha
+    limpio = texto.strip()
+    if len(limpio) == 10 and limpio[4] == '-' and limpio[7] == '-':
+        fecha = date.fromisoformat(limpio)
+    else:
+        fecha = parse_fecha(limpio)
+    if len(_cache_fechas) >= LIMITE_CACHE_FECHAS:
+        _cache_fechas.clear()
+    _cache_fechas[texto] = fecha
+    return fecha
+
+
+def ordinal_fecha(texto):
+    """/**
+    * Convierte una fecha de texto al ordinal que guarda AlmacenVentas.
+    * @param texto cadena con la fecha a parsear.
+    * @return entero con date.toordinal().
+    */"""
+    return parse_fecha_rapida(texto).toordinal()
+
+
+class InformeErrores:
+    """/**
+    * Junta las filas rechazadas durante una carga para enseñar un resumen
+    * al final en vez de imprimir cada error segun aparece.
+    * Guarda el total por tabla y solo los primeros ejemplos.
+    * @param max_ejemplos ejemplos que se guardan por tabla.
+    */"""
+    def __init__(self, max_ejemplos=5):
+        self.max_ejemplos = max_ejemplos
+        self.totales = {}
+        self.ejemplos = {}
+
+    def registrar(self, tabla, fila, error):
+        """/**
+        * Apunta una fila rechazada.
+        * @param tabla nombre de la tabla.
+        * @param fila numero de fila de datos (sin contar la cabecera).
+        * @param error excepcion que provoco el rechazo.
+        * @return None
+        */"""
+        self.totales[tabla] = self.totales.get(tabla, 0) + 1
+        ejemplos = self.ejemplos.setdefault(tabla, [])
+        if len(ejemplos) < self.max_ejemplos:
+            ejemplos.append((fila, str(error)))
+
+    def unir(self, otro):
+        """/**
+        * Suma a este informe los errores de otro (por ejemplo de otro hilo).
+        * @param otro InformeErrores a añadir.
+        * @return None
+        */"""
+        for tabla, total in otro.totales.items():
+            self.totales[tabla] = self.totales.get(tabla, 0) + total
+            ejemplos = self.ejemplos.setdefault(tabla, [])
+            hueco = self.max_ejemplos - len(ejemplos)
+            ejemplos.extend(otro.ejemplos.get(tabla, [])[:hueco])
+
+    def total(self):
+        """/**
+        * @return numero total de filas rechazadas.
+        */"""
+        return sum(self.totales.values())
+
+    def resumen(self):
+        """/**
+        * Prepara las lineas del resumen de errores.
+        * @return lista de cadenas, vacia si no hubo errores.
+        */"""
+        lineas = []
+        for tabla, total in self.totales.items():
+            lineas.append(f"Filas rechazadas en {tabla}: {total}")
+            for fila, mensaje in self.ejemplos.get(tabla, []):
+                lineas.append(f"  fila {fila}: {mensaje}")
+            if total > len(self.ejemplos.get(tabla, [])):
+                lineas.append(f"  ... y {total - len(self.ejemplos[tabla])} mas")
+        return lineas
+
+
+def compilar_decodificador(esquema, cabecera):
+    """/**
+    * Prepara una funcion que convierte una fila del CSV (lista de textos) en
+    * una tupla de valores ya convertidos. Las posiciones y los conversores se
+    * resuelven una sola vez, al leer la cabecera.
+    * @param esquema tupla de pares (columna, conversor).
+    * @param cabecera primera fila del CSV.
+    * @return funcion fila -> tupla; lanza KeyError si falta alguna columna.
+    */"""
+    posiciones = []
+    conversores = []
+    for columna, conversor in esquema:
+        if columna not in cabecera:
+            raise KeyError(columna)
+        posiciones.append(cabecera.index(columna))
+        conversores.append(conversor)
+    pares = tuple(zip(posiciones, conversores))
+
+    def decodificar(fila):
+        return tuple([conversor(fila[posicion]) for posicion, conversor in pares])
+
+    return decodificar
+
+
+# /** Columnas de clientes.csv y como se convierte cada una. */
+ESQUEMA_CLIENTES = (
+    ('id', int),
+    ('nombre', str.strip),
+    ('email', str.strip),
+    ('fecha_alta', parse_fecha_rapida),
+)
+# /** Columnas de eventos.csv y como se convierte cada una. */
+ESQUEMA_EVENTOS = (
+    ('id', int),
+    ('nombre', str.strip),
+    ('categoria', str.strip),
+    ('fecha', parse_fecha_rapida),
+    ('precio', float),
+)
+# /** Columnas de ventas.csv, en el orden de las columnas de AlmacenVentas. */
+ESQUEMA_VENTAS = (
+    ('id', int),
+    ('cliente_id', int),
+    ('evento_id', int),
+    ('cantidad', int),
+    ('total', float),
+    ('fecha', ordinal_fecha),
+)
+
+
+def _leer_tabla(ruta, tabla, esquema, informe, tratar_bloque):
+    """/**
+    * Lee un CSV por bloques de TAM_BLOQUE_VENTAS filas con un lector por
+    * posiciones y pasa cada bloque de filas ya convertidas a tratar_bloque.
+    * Las filas vacias se saltan y las que fallan se apuntan en el informe.
+    * Si falta una columna en la cabecera todas las filas cuentan como erroneas.
+    * Los bytes que no son UTF-8 valido se cambian por U+FFFD, asi una fila
+    * cortada a medias no impide cargar el resto.
+    * @param ruta fichero a leer.
+    * @param tabla nombre de la tabla para el informe.
+    * @param esquema columnas y conversores (ESQUEMA_*).
+    * @param informe InformeErrores donde apuntar las filas rechazadas.
+    * @param tratar_bloque funcion que recibe la lista de tuplas validas.
+    * @return tupla (filas leidas, bytes leidos del fichero).
+    */"""
+    filas = 0
+    with open(ruta, newline='', encoding='utf-8', errors='replace') as f:
+        lector = csv.reader(f)
+        cabecera = next(lector, None)
+        if cabecera is None:
+            return filas, f.buffer.tell()
+        try:
+            decodificar = compilar_decodificador(esquema, cabecera)
+        except KeyError as error:
+            for fila in lector:
+                if fila:
+                    filas += 1
+                    informe.registrar(tabla, filas, error)
+            return filas, f.buffer.tell()
+
+        while True:
+            bloque = list(islice(lector, TAM_BLOQUE_VENTAS))
+            if not bloque:
+                break
+            validas = []
+            for fila in bloque:
+                if not fila:
+                    continue
+                filas += 1
+                try:
+                    validas.append(decodificar(fila))
+                except Exception as error:
+                    informe.registrar(tabla, filas, error)
+            tratar_bloque(validas)
+        return filas, f.buffer.tell()
+
+
+def _leer_clientes(ruta):
+    """/**
+    * Lee el CSV de clientes siguiendo ESQUEMA_CLIENTES.
+    * @param ruta fichero a leer.
+    * @return tupla (clientes por id, informe de errores, filas leidas, segundos).
+    */"""
+    inicio = time.perf_counter()
+    resultado = {}
+    informe = InformeErrores()
+
+    def tratar_bloque(bloque):
+        for valores in bloque:
+            resultado[valores[0]] = Cliente(*valores)
+
+    filas, _ = _leer_tabla(ruta, 'clientes', ESQUEMA_CLIENTES, informe, tratar_bloque)
+    return resultado, informe, filas, time.perf_counter() - inicio
+
+
+def _leer_eventos(ruta):
+    """/**
+    * Lee el CSV de eventos siguiendo ESQUEMA_EVENTOS.
+    * @param ruta fichero a leer.
+    * @return tupla (eventos por id, informe de errores, filas leidas, segundos).
+    */"""
+    inicio = time.perf_counter()
+    resultado = {}
+    informe = InformeErrores()
+
+    def tratar_bloque(bloque):
+        for valores in bloque:
+            resultado[valores[0]] = Evento(*valores)
+
+    filas, _ = _leer_tabla(ruta, 'eventos', ESQUEMA_EVENTOS, informe, tratar_bloque)
+    return resultado, informe, filas, time.perf_counter() - inicio
+
+
+def _leer_ventas(ruta):
+    """/**
+    * Lee el CSV de ventas siguiendo ESQUEMA_VENTAS y añade cada bloque al
+    * almacen de golpe, columna a columna.
+    * @param ruta fichero a leer.
+    * @return tupla (almacen de ventas, informe de errores, filas leidas, segundos).
+    */"""
+    inicio = time.perf_counter()
+    almacen = AlmacenVentas()
+    informe = InformeErrores()
+
+    def tratar_bloque(bloque):
+        if bloque:
+            almacen.extender(*zip(*bloque))
+
+    filas, almacen.bytes_leidos = _leer_tabla(ruta, 'ventas', ESQUEMA_VENTAS, informe, tratar_bloque)
+    almacen.filas_leidas = filas
+    return almacen, informe, filas, time.perf_counter() - inicio
+
+
+def _huella_fichero(ruta):
+    """/**
+    * Identifica la version de un fichero por su tamaño y fecha de modificacion.
+    * @param ruta fichero a revisar.
+    * @return tupla (bytes, mtime en ns) o None si no existe.
+    */"""
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (estado.st_size, estado.st_mtime_ns)
+
+
+def _decodificar_cache(datos, huellas):
+    """/**
+    * Saca de la cache las tablas cuyo CSV no ha cambiado.
+    * Formato: MAGIA_CACHE, 8 bytes con el largo de la cabecera, la cabecera
+    * en pickle y despues los bytes de cada columna de ventas seguidos.
+    * @param datos contenido del fichero (mmap o bytes).
+    * @param huellas diccionario tabla -> (ruta, huella actual).
+    * @return diccionario tabla -> datos ya convertidos.
+    */"""
+    if datos[:len(MAGIA_CACHE)] != MAGIA_CACHE:
+        return {}
+    inicio = len(MAGIA_CACHE) + 8
+    largo = int.from_bytes(datos[len(MAGIA_CACHE):inicio], 'little')
+    cabecera = pickle.loads(datos[inicio:inicio + largo])
+    if cabecera.get('orden_bytes') != sys.byteorder:
+        return {}
+
+    validas = [nombre for nombre, actual in huellas.items()
+               if actual[1] is not None and cabecera['huellas'].get(nombre) == actual]
+    resultado = {}
+    if 'clientes' in validas:
+        resultado['clientes'] = {
+            fila[0]: Cliente(fila[0], fila[1], fila[2], date.fromordinal(fila[3]))
+            for fila in cabecera['clientes']
+        }
+    if 'eventos' in validas:
+        resultado['eventos'] = {
+            fila[0]: Evento(fila[0], fila[1], fila[2], date.fromordinal(fila[3]), fila[4])
+            for fila in cabecera['eventos']
+        }
+    if 'ventas' in validas:
+        almacen = AlmacenVentas()
+        posicion = inicio + largo
+        with memoryview(datos) as vista:
+            for atributo, largo_columna in cabecera['ventas']:
+                with vista[posicion:posicion + largo_columna] as trozo:
+                    getattr(almacen, atributo).frombytes(trozo)
+                posicion += largo_columna
+        almacen.bytes_leidos = cabecera['bytes_ventas']
+        almacen.filas_leidas = cabecera['filas_ventas']
+        resultado['ventas'] = almacen
+    return resultado
+
+
+def _leer_cache(huellas):
+    """/**
+    * Abre la cache (con mmap si se puede) y devuelve las tablas aprovechables.
+    * Si la cache no existe o esta dañada se ignora.
+    * @param huellas diccionario tabla -> (ruta, huella actual).
+    * @return diccionario tabla -> datos ya convertidos.
+    */"""
+    try:
+        f = open(CACHE_FILE, 'rb')
+    except FileNotFoundError:
+        return {}
+    with f:
+        try:
+            datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            datos = f.read()
+        try:
+            return _decodificar_cache(datos, huellas)
+        except Exception:
+            return {}
+        finally:
+            if isinstance(datos, mmap.mmap):
+                datos.close()
+
+
+def _guardar_cache(huellas, tablas):
+    """/**
+    * Escribe la cache con las tablas cargadas, primero en un temporal.
+    * @param huellas diccionario tabla -> (ruta, huella) de cuando se leyeron.
+    * @param tablas diccionario tabla -> datos cargados.
+    * @return None
+    */"""
+    cabecera = {
+        'orden_bytes': sys.byteorder,
+        'huellas': {nombre: huellas[nombre] for nombre in tablas},
+        'clientes': [
+            (c.id, c.nombre, c.email, c.fecha_alta.toordinal())
+            for c in tablas.get('clientes', {}).values()
+        ],
+        'eventos': [
+            (e.id, e.nombre, e.categoria, e.fecha.toordinal(), e.precio)
+            for e in tablas.get('eventos', {}).values()
+        ],
+        'ventas': [],
+        'bytes_ventas': 0,
+        'filas_ventas': 0,
+    }
+    columnas = []
+    if 'ventas' in tablas:
+        cabecera['bytes_ventas'] = tablas['ventas'].bytes_leidos
+        cabecera['filas_ventas'] = tablas['ventas'].filas_leidas
+        for atributo in AlmacenVentas.COLUMNAS:
+            columna = getattr(tablas['ventas'], atributo)
+            cabecera['ventas'].append((atributo, len(columna) * columna.itemsize))
+            columnas.append(columna)
+    contenido = pickle.dumps(cabecera, protocol=pickle.HIGHEST_PROTOCOL)
+
+    temporal = CACHE_FILE + ".tmp"
+    try:
+        with open(temporal, 'wb') as f:
+            f.write(MAGIA_CACHE)
+            f.write(len(contenido).to_bytes(8, 'little'))
+            f.write(contenido)
+            for columna in columnas:
+                columna.tofile(f)
+        os.replace(temporal, CACHE_FILE)
+    except OSError as error:
+        print("No se pudo guardar la cache:", error)
+
+
+# /** Tablas e indices de la base de datos SQLite. */
+ESQUEMA_SQL = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY, nombre TEXT, email TEXT, fecha_alta TEXT);
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY, nombre TEXT, categoria TEXT, fecha TEXT, precio REAL);
+CREATE TABLE IF NOT EXISTS ventas (
+    id INTEGER, cliente_id INTEGER, evento_id INTEGER, cantidad INTEGER,
+    total REAL, fecha INTEGER);
+CREATE INDEX IF NOT EXISTS ventas_fecha ON ventas (fecha);
+CREATE INDEX IF NOT EXISTS ventas_evento ON ventas (evento_id);
+CREATE INDEX IF NOT EXISTS ventas_cliente ON ventas (cliente_id);
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+
+class BaseDatosSQLite:
+    """/**
+    * Guarda clientes, eventos y ventas en un fichero SQLite en vez de en
+    * memoria. Las ventas se quedan en la base de datos y los filtros, las
+    * estadisticas y el informe se resuelven con SQL usando los indices de
+    * fecha, evento y cliente. Las fechas de las ventas se guardan como
+    * ordinal (igual que en AlmacenVentas) y las demas como texto YYYY-MM-DD.
+    * @param ruta fichero de la base de datos (se crea si no existe).
+    */"""
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.create_aggregate('suma_exacta', 1, SumaExacta)
+        self.conexion.executescript(ESQUEMA_SQL)
+        self.numero_ventas = self.conexion.execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+
+    def importada(self):
+        """/**
+        * @return True si ya se han importado los tres CSV.
+        */"""
+        fila = self.conexion.execute("SELECT valor FROM meta WHERE clave = 'importado'").fetchone()
+        return fila is not None
+
+    def importar_csv(self, ruta_clientes, ruta_eventos, ruta_ventas):
+        """/**
+        * Vuelca los CSV en la base de datos en una sola transaccion, por
+        * bloques y con las mismas validaciones que la carga en memoria.
+        * Cada tabla se marca en meta al importarla y no se vuelve a importar
+        * (las ventas no tienen clave y se duplicarian); la base de datos solo
+        * queda como importada cuando estan las tres. Si falta algun CSV se
+        * importa en una llamada posterior, cuando exista.
+        * @return tupla (InformeErrores, diccionario tabla -> filas leidas),
+        *         solo con las tablas importadas en esta llamada.
+        */"""
+        informe = InformeErrores()
+        filas = {}
+        tablas = (
+            ('clientes', ruta_clientes, ESQUEMA_CLIENTES,
+             "INSERT OR REPLACE INTO clientes VALUES (?, ?, ?, ?)",
+             lambda v: (v[0], v[1], v[2], v[3].isoformat())),
+            ('eventos', ruta_eventos, ESQUEMA_EVENTOS,
+             "INSERT OR REPLACE INTO eventos VALUES (?, ?, ?, ?, ?)",
+             lambda v: (v[0], v[1], v[2], v[3].isoformat(), v[4])),
+            ('ventas', ruta_ventas, ESQUEMA_VENTAS,
+             "INSERT INTO ventas VALUES (?, ?, ?, ?, ?, ?)",
+             None),
+        )
+        ahora = datetime.now().isoformat(timespec='seconds')
+        with self.conexion:
+            hechas = {clave for clave, in self.conexion.execute("SELECT clave FROM meta")}
+            for tabla, ruta, esquema, sql, convertir in tablas:
+                if f'importado.{tabla}' in hechas or not os.path.exists(ruta):
+                    continue
+
+                def tratar_bloque(bloque, sql=sql, convertir=convertir):
+                    self.conexion.executemany(sql, map(convertir, bloque) if convertir else bloque)
+
+                filas[tabla], _ = _leer_tabla(ruta, tabla, esquema, informe, tratar_bloque)
+                self.conexion.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (f'importado.{tabla}', ahora))
+                hechas.add(f'importado.{tabla}')
+            if all(f'importado.{tabla[0]}' in hechas for tabla in tablas):
+                self.conexion.execute("INSERT OR REPLACE INTO meta VALUES ('importado', ?)", (ahora,))
+        self.numero_ventas = self.conexion.execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+        return informe, filas
+
+    def cargar_clientes(self):
+        """/**
+        * @return diccionario id -> Cliente con todos los clientes.
+        */"""
+        filas = self.conexion.execute("SELECT id, nombre, email, fecha_alta FROM clientes ORDER BY id")
+        return {id_cliente: Cliente(id_cliente, nombre, email, date.fromisoformat(fecha))
+                for id_cliente, nombre, email, fecha in filas}
+
+    def cargar_eventos(self):
+        """/**
+        * @return diccionario id -> Evento con todos los eventos.
+        */"""
+        filas = self.conexion.execute("SELECT id, nombre, categoria, fecha, precio FROM eventos ORDER BY id")
+        return {id_evento: Evento(id_evento, nombre, categoria, date.fromisoformat(fecha), precio)
+                for id_evento, nombre, categoria, fecha, precio in filas}
+
+    def agregar_clientes(self, nuevos):
+        """/**
+        * Guarda clientes nuevos en la base de datos.
+        * @param nuevos lista de objetos Cliente.
+        * @return None
+        */"""
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO clientes VALUES (?, ?, ?, ?)",
+                [(c.id, c.nombre, c.email, c.fecha_alta.isoformat()) for c in nuevos])
+
+    def agregar_venta(self, venta):
+        """/**
+        * Guarda una venta nueva en la base de datos.
+        * @param venta objeto Venta.
+        * @return None
+        */"""
+        with self.conexion:
+            self.conexion.execute(
+                "INSERT INTO ventas VALUES (?, ?, ?, ?, ?, ?)",
+                (venta.id, venta.cliente_id, venta.evento_id, venta.cantidad, venta.total,
+                 venta.fecha.toordinal()))
+        self.numero_ventas += 1
+
+    def _ventas(self, condicion, parametros, orden):
+        """/**
+        * @param condicion expresion WHERE sobre la tabla ventas.
+        * @param parametros valores para la condicion.
+        * @param orden expresion ORDER BY.
+        * @return lista de objetos Venta.
+        */"""
+        filas = self.conexion.execute(
+            "SELECT id, cliente_id, evento_id, cantidad, total, fecha FROM ventas "
+            f"WHERE {condicion} ORDER BY {orden}", parametros)
+        return [Venta(id_venta, cliente_id, evento_id, cantidad, total, date.fromordinal(dia))
+                for id_venta, cliente_id, evento_id, cantidad, total, dia in filas]
+
+    def ventas_en_rango(self, fecha_inicio, fecha_fin):
+        """/**
+        * @return ventas entre dos fechas (incluidas) ordenadas por fecha.
+        */"""
+        return self._ventas("fecha BETWEEN ? AND ?",
+                            (fecha_inicio.toordinal(), fecha_fin.toordinal()), "fecha, rowid")
+
+    def ventas_de_cliente(self, cliente_id):
+        """/**
+        * @return compras de un cliente ordenadas por fecha.
+        */"""
+        return self._ventas("cliente_id = ?", (cliente_id,), "fecha, rowid")
+
+    def ventas_de_evento(self, evento_id):
+        """/**
+        * @return ventas de un evento en el orden en que se guardaron.
+        */"""
+        return self._ventas("evento_id = ?", (evento_id,), "rowid")
+
+    def valor_cliente(self, cliente_id):
+        """/**
+        * @return tupla (importe total, entradas compradas, numero de compras).
+        */"""
+        return self.conexion.execute(
+            "SELECT COALESCE(SUM(total), 0), COALESCE(SUM(cantidad), 0), COUNT(*) "
+            "FROM ventas WHERE cliente_id = ?", (cliente_id,)).fetchone()
+
+    def totales_por_evento(self):
+        """/**
+        * Ingresos y unidades por evento, en el orden en que aparece cada
+        * evento por primera vez y sumados con SumaExacta (igual que
+        * AgregadosVentas).
+        * @return tupla (ingresos totales, ingresos por evento, unidades por evento).
+        */"""
+        ingresos_evento = {}
+        unidades_evento = {}
+        filas = self.conexion.execute(
+            "SELECT evento_id, suma_exacta(total), SUM(cantidad) FROM ventas "
+            "GROUP BY evento_id ORDER BY MIN(rowid)")
+        for evento_id, ingresos, unidades in filas:
+            ingresos_evento[evento_id] = ingresos
+            unidades_evento[evento_id] = unidades
+        ingresos_totales = self.conexion.execute("SELECT suma_exacta(total) FROM ventas").fetchone()[0]
+        return ingresos_totales or 0.0, ingresos_evento, unidades_evento
+
+    def totales(self, fecha_inicio, fecha_fin, categoria=None):
+        """/**
+        * Mismo uso que RollupVentas.totales.
+        * @return tupla (ingresos, unidades) entre dos fechas.
+        */"""
+        rango = (fecha_inicio.toordinal(), fecha_fin.toordinal())
+        if categoria is None:
+            return self.conexion.execute(
+                "SELECT TOTAL(total), COALESCE(SUM(cantidad), 0) FROM ventas "
+                "WHERE fecha BETWEEN ? AND ?", rango).fetchone()
+        return self.conexion.execute(
+            "SELECT TOTAL(v.total), COALESCE(SUM(v.cantidad), 0) FROM ventas v "
+            "LEFT JOIN eventos e ON e.id = v.evento_id "
+            "WHERE v.fecha BETWEEN ? AND ? AND COALESCE(e.categoria, '?') = ?",
+            rango + (categoria,)).fetchone()
+
+    def categorias(self):
+        """/**
+        * Categorias que pueden tener ventas ('?' para eventos que no existen).
+        * @return lista ordenada de categorias.
+        */"""
+        filas = self.conexion.execute("SELECT DISTINCT categoria FROM eventos")
+        return sorted({categoria for (categoria,) in filas} | {"?"})
+
+    def por_mes(self, fecha_inicio, fecha_fin):
+        """/**
+        * Mismo uso que RollupVentas.por_mes.
+        * @return lista de tuplas ('YYYY-MM', ingresos, unidades).
+        */"""
+        filas = self.conexion.execute(
+            "SELECT fecha, TOTAL(total), SUM(cantidad) FROM ventas "
+            "WHERE fecha BETWEEN ? AND ? GROUP BY fecha ORDER BY fecha",
+            (fecha_inicio.toordinal(), fecha_fin.toordinal()))
+        return sumar_por_mes((date.fromordinal(dia), ingresos, unidades)
+                             for dia, ingresos, unidades in filas)
+
+    def lineas_ventas(self, desde=0, limite=None):
+        """/**
+        * Lineas de texto de las ventas para listados, leidas por paginas.
+        * @return generador de cadenas sin salto de linea.
+        */"""
+        filas = self.conexion.execute(
+            "SELECT id, cliente_id, evento_id, total, fecha FROM ventas "
+            "ORDER BY rowid LIMIT ? OFFSET ?", (-1 if limite is None else limite, desde))
+        textos_fecha = {}
+        for id_venta, cliente_id, evento_id, total, dia in filas:
+            fecha = textos_fecha.get(dia)
+            if fecha is None:
+                fecha = textos_fecha[dia] = date.fromordinal(dia).isoformat()
+            yield f"Venta {id_venta} cliente {cliente_id} evento {evento_id} total {total} fecha {fecha}"
+
+    def cerrar(self):
+        """/**
+        * Cierra la conexion con la base de datos.
+        * @return None
+        */"""
+        self.conexion.close()
+
+
+def usar_sqlite(ruta=None):
+    """/**
+    * Pasa a guardar los datos en SQLite en vez de en memoria.
+    * @param ruta fichero de la base de datos (None para SQLITE_FILE).
+    * @return la BaseDatosSQLite abierta.
+    */"""
+    global base_datos
+    if base_datos is not None:
+        base_datos.cerrar()
+    base_datos = BaseDatosSQLite(ruta or SQLITE_FILE)
+    nueva_version_datos()
+    return base_datos
+
+
+def hay_ventas():
+    """/**
+    * @return True si hay ventas cargadas, en memoria o en SQLite.
+    */"""
+    if base_datos is not None:
+        return base_datos.numero_ventas > 0
+    return bool(ventas)
+
+
+def cargar_desde_sqlite():
+    """/**
+    * Version de cargar_datos para el modo SQLite: la primera vez importa los
+    * CSV a la base de datos y despues solo lee clientes y eventos, que son
+    * pocos; las ventas se quedan en la base de datos.
+    * @return None
+    */"""
+    global clientes, eventos, ventas, informe_errores
+    informe_errores = InformeErrores()
+    if not base_datos.importada():
+        informe_errores, filas = base_datos.importar_csv(CLIENTES_FILE, EVENTOS_FILE, VENTAS_FILE)
+        for nombre, ruta in (('clientes', CLIENTES_FILE), ('eventos', EVENTOS_FILE), ('ventas', VENTAS_FILE)):
+            if nombre in filas:
+                print(f"{os.path.basename(ruta)}: {filas[nombre]} filas importadas a {base_datos.ruta}")
+            elif not os.path.exists(ruta):
+                print(f"No se encontró {os.path.basename(ruta)}")
+        for linea in informe_errores.resumen():
+            print(linea)
+
+    clientes = base_datos.cargar_clientes()
+    eventos = base_datos.cargar_eventos()
+    ventas = None
+    actualizar_derivados()
+    _busqueda_clientes()
+    if clientes:
+        _secuencia_clientes().asegurar_minimo(max(clientes))
+
+    print("Clientes cargados:", len(clientes))
+    print("Eventos cargados:", len(eventos))
+    print("Ventas en la base de datos:", base_datos.numero_ventas)
+
+
+@medido('cargar_datos')
 def cargar_datos():
     """/**
-    * Lee los CSV de clientes, eventos y ventas y llena las colecciones globales.
+    * Lee los CSV de clientes, eventos y ventas y llena las colecciones globales
+    * (con --sqlite las ventas se quedan en la base de datos, ver
+    * cargar_desde_sqlite).
+    * Las tablas cuyo CSV no ha cambiado desde la ultima vez se sacan de la
+    * cache binaria; el resto se leen a la vez y, si son grandes, cada una en
+    * su propio proceso para aprovechar varios nucleos.
     * @return None
     */"""
-    global clientes, eventos, ventas
+    global clientes, eventos, ventas, informe_errores
+    confirmar_clientes()
+    nueva_version_datos()
+    if base_datos is not None:
+        cargar_desde_sqlite()
+        return
     clientes = {}
     eventos = {}
-    ventas = []
+    ventas = AlmacenVentas()
+    informe_errores = InformeErrores()
+
+    tablas = [
+        ('clientes', CLIENTES_FILE, _leer_clientes),
+        ('eventos', EVENTOS_FILE, _leer_eventos),
+        ('ventas', VENTAS_FILE, _leer_ventas),
+    ]
+    huellas = {nombre: (ruta, _huella_fichero(ruta)) for nombre, ruta, _ in tablas}
+    desde_cache = _leer_cache(huellas)
+    existentes = [tabla for tabla in tablas
+                  if huellas[tabla[0]][1] is not None and tabla[0] not in desde_cache]
+
+    resultados = {}
+    if existentes:
+        tamano = sum(huellas[nombre][1][0] for nombre, _, _ in existentes)
+        if tamano >= UMBRAL_CARGA_PROCESOS:
+            ejecutor = ProcessPoolExecutor(max_workers=len(existentes))
+        else:
+            ejecutor = ThreadPoolExecutor(max_workers=len(existentes))
+        with ejecutor:
+            pendientes = {nombre: ejecutor.submit(lector, ruta) for nombre, ruta, lector in existentes}
+            resultados = {nombre: tarea.result() for nombre, tarea in pendientes.items()}
+
+    cargadas = {}
+    for nombre, ruta, _ in tablas:
+        if nombre in desde_cache:
+            datos = desde_cache[nombre]
+            metricas.contar(f"cargar_datos.{nombre}.filas_cache", len(datos))
+            print(f"{os.path.basename(ruta)}: {len(datos)} filas desde la cache")
+        elif nombre in resultados:
+            datos, informe, filas, segundos = resultados[nombre]
+            informe_errores.unir(informe)
+            metricas.contar(f"cargar_datos.{nombre}.filas_leidas", filas)
+            metricas.contar(f"cargar_datos.{nombre}.filas_rechazadas", informe.totales.get(nombre, 0))
+            metricas.anotar_tiempo(f"cargar_datos.{nombre}.lectura", segundos)
+            velocidad = filas / segundos if segundos > 0 else 0
+            print(f"{os.path.basename(ruta)}: {filas} filas en {segundos:.3f} s ({velocidad:.0f} filas/s)")
+        else:
+            print(f"No se encontró {os.path.basename(ruta)}")
+            continue
+        cargadas[nombre] = datos
+        if nombre == 'clientes':
+            clientes = datos
+        elif nombre == 'eventos':
+            eventos = datos
+        else:
+            ventas = datos
 
-    if os.path.exists(CLIENTES_FILE):
-        with open(CLIENTES_FILE, newline='', encoding='utf-8') as f:
-            lector = csv.DictReader(f)
-            for fila in lector:
-                try:
-                    cliente = Cliente(
-                        int(fila['id']),
-                        fila['nombre'].strip(),
-                        fila['email'].strip(),
-                        parse_fecha(fila['fecha_alta'])
-                    )
-                    clientes[cliente.id] = cliente
-                except Exception as error:
-                    print("Error en fila de clientes:", error)
-    else:
-        print("No se encontró clientes.csv")
+    if resultados:
+        _guardar_cache(huellas, cargadas)
 
-    if os.path.exists(EVENTOS_FILE):
-        with open(EVENTOS_FILE, newline='', encoding='utf-8') as f:
-            lector = csv.DictReader(f)
-            for fila in lector:
-                try:
-                    evento = Evento(
-                        int(fila['id']),
-                        fila['nombre'].strip(),
-                        fila['categoria'].strip(),
-                        parse_fecha(fila['fecha']),
-                        float(fila['precio'])
-                    )
-                    eventos[evento.id] = evento
-                except Exception as error:
-                    print("Error en fila de eventos:", error)
-    else:
-        print("No se encontró eventos.csv")
+    for linea in informe_errores.resumen():
+        print(linea)
 
-    if os.path.exists(VENTAS_FILE):
-        with open(VENTAS_FILE, newline='', encoding='utf-8') as f:
-            lector = csv.DictReader(f)
-            for fila in lector:
-                try:
-                    venta = Venta(
-                        int(fila['id']),
-                        int(fila['cliente_id']),
-                        int(fila['evento_id']),
-                        int(fila['cantidad']),
-                        float(fila['total']),
-                        parse_fecha(fila['fecha'])
-                    )
-                    ventas.append(venta)
-                except Exception as error:
-                    print("Error en fila de ventas:", error)
-    else:
-        print("No se encontró ventas.csv")
+    actualizar_derivados()
+    _busqueda_clientes()
+    if clientes:
+        _secuencia_clientes().asegurar_minimo(max(clientes))
 
     print("Clientes cargados:", len(clientes))
     print("Eventos cargados:", len(eventos))
     print("Ventas cargadas:", len(ventas))
 
 
-def listar(tabla):
+def _tamano_tabla(tabla):
+    """/**
+    * @param tabla texto: 'clientes', 'eventos' o 'ventas'.
+    * @return numero de filas de la tabla o None si no existe.
+    */"""
+    if tabla == 'clientes':
+        return len(clientes)
+    if tabla == 'eventos':
+        return len(eventos)
+    if tabla == 'ventas':
+        if base_datos is not None:
+            return base_datos.numero_ventas
+        return len(ventas) if ventas else 0
+    return None
+
+
+def lineas_tabla(tabla, desde=0, limite=None):
+    """/**
+    * Genera una a una las lineas de texto de una tabla, solo las pedidas.
+    * Las ventas se formatean directamente desde las columnas del almacen, y
+    * la fecha de hoy de los eventos se calcula una sola vez.
+    * @param tabla texto: 'clientes', 'eventos' o 'ventas'.
+    * @param desde posicion de la primera fila.
+    * @param limite numero maximo de filas (None para todas).
+    * @return generador de cadenas sin salto de linea.
+    */"""
+    hasta = None if limite is None else desde + limite
+    if tabla == 'clientes':
+        for cliente in islice(clientes.values(), desde, hasta):
+            yield str(cliente)
+    elif tabla == 'eventos':
+        hoy = fecha_hoy()
+        for evento in islice(eventos.values(), desde, hasta):
+            yield evento.texto(hoy)
+    elif tabla == 'ventas' and base_datos is not None:
+        yield from base_datos.lineas_ventas(desde, limite)
+    elif tabla == 'ventas' and ventas:
+        hasta = len(ventas) if hasta is None else min(hasta, len(ventas))
+        textos_fecha = {}
+        columnas = zip(ventas.ids[desde:hasta], ventas.cliente_ids[desde:hasta],
+                       ventas.evento_ids[desde:hasta], ventas.totales[desde:hasta],
+                       ventas.fechas[desde:hasta])
+        for id_venta, cliente_id, evento_id, total, dia in columnas:
+            fecha = textos_fecha.get(dia)
+            if fecha is None:
+                fecha = textos_fecha[dia] = date.fromordinal(dia).isoformat()
+            yield f"Venta {id_venta} cliente {cliente_id} evento {evento_id} total {total} fecha {fecha}"
+
+
+def escribir_lineas(lineas, destino, lineas_por_bloque=LINEAS_POR_BLOQUE):
+    """/**
+    * Escribe lineas en bloques grandes (un solo write por bloque) en vez de
+    * un print por linea.
+    * @param lineas iterable de cadenas sin salto de linea.
+    * @param destino fichero o sys.stdout.
+    * @param lineas_por_bloque lineas que se juntan en cada write.
+    * @return numero de lineas escritas.
+    */"""
+    escritas = 0
+    while True:
+        bloque = list(islice(lineas, lineas_por_bloque))
+        if not bloque:
+            break
+        bloque.append('')
+        destino.write('\n'.join(bloque))
+        escritas += len(bloque) - 1
+    return escritas
+
+
+def listar(tabla, desde=0, limite=None, destino=None):
+    """/**
+    * Muestra el contenido de la tabla solicitada, o solo una pagina.
+    * @param tabla texto: 'clientes', 'eventos' o 'ventas'.
+    * @param desde posicion de la primera fila a mostrar.
+    * @param limite numero maximo de filas (None para todas).
+    * @param destino donde escribir (por defecto la pantalla).
+    * @return numero de filas mostradas.
+    */"""
+    tamano = _tamano_tabla(tabla)
+    if tamano is None:
+        print("Tabla no reconocida")
+        return 0
+    if not tamano:
+        print(f"No hay {tabla} para mostrar")
+        return 0
+    destino = destino or sys.stdout
+    escritas = escribir_lineas(lineas_tabla(tabla, desde, limite), destino)
+    destino.flush()
+    return escritas
+
+
+def exportar_tabla(tabla, ruta):
+    """/**
+    * Vuelca una tabla entera a un fichero de texto con un buffer grande.
+    * @param tabla texto: 'clientes', 'eventos' o 'ventas'.
+    * @param ruta fichero de salida.
+    * @return numero de filas escritas.
+    */"""
+    if _tamano_tabla(tabla) is None:
+        print("Tabla no reconocida")
+        return 0
+    with open(ruta, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        return escribir_lineas(lineas_tabla(tabla), f)
+
+
+def listar_paginado(tabla, tam_pagina=TAM_PAGINA):
     """/**
-    * Muestra por pantalla el contenido de la tabla solicitada.
+    * Lista una tabla por paginas, preguntando entre una y otra.
     * @param tabla texto: 'clientes', 'eventos' o 'ventas'.
+    * @param tam_pagina filas por pagina.
     * @return None
     */"""
-    if tabla == 'clientes':
-        if not clientes:
-            print("No hay clientes para mostrar")
-            return
-        for cliente in clientes.values():
-            print(cliente)
-    elif tabla == 'eventos':
-        if not eventos:
-            print("No hay eventos para mostrar")
-            return
-        for evento in eventos.values():
-            print(evento)
-    elif tabla == 'ventas':
-        if not ventas:
-            print("No hay ventas para mostrar")
-            return
-        for venta in ventas:
-            print(venta)
-    else:
-        print("Tabla no reconocida")
+    tamano = _tamano_tabla(tabla)
+    if not tamano:
+        listar(tabla)
+        return
+    desde = 0
+    while desde < tamano:
+        desde += listar(tabla, desde, tam_pagina)
+        if desde >= tamano:
+            break
+        respuesta = input(f"-- {desde}/{tamano} -- Enter sigue, g guarda todo en fichero, q sale: ")
+        respuesta = respuesta.strip().lower()
+        if respuesta == 'q':
+            break
+        if respuesta == 'g':
+            ruta = input("Fichero de salida: ").strip()
+            if ruta:
+                escritas = exportar_tabla(tabla, ruta)
+                print(f"Guardadas {escritas} filas en {ruta}")
+            break
 
 
 def pedir_fecha(mensaje):
@@ -237,19 +1927,38 @@ def pedir_fecha(mensaje):
             print("Formato incorrecto, usa YYYY-MM-DD")
 
 
-def siguiente_id_clientes():
+class SecuenciaIds:
     """/**
-    * Busca el siguiente id disponible para clientes.
-    * @return entero con el nuevo id.
+    * Contador persistente de ids de clientes guardado en un fichero pequeño,
+    * para dar el siguiente id sin recorrer clientes.csv.
+    * Si el fichero no existe se inicializa una sola vez con el id maximo del CSV.
+    * @param ruta fichero donde se guarda el ultimo id entregado.
+    * @param ruta_csv CSV de clientes usado para inicializar el contador.
     */"""
-    max_id = 0
-    for clave in clientes.keys():
-        if clave > max_id:
-            max_id = clave
+    def __init__(self, ruta, ruta_csv):
+        self.ruta = ruta
+        self.ruta_csv = ruta_csv
+        self.ultimo = None
+        self.guardado = None
 
-    if os.path.exists(CLIENTES_FILE):
+    def _cargar(self):
+        """/**
+        * Lee el ultimo id guardado, o lo calcula del CSV si no hay fichero.
+        * @return None
+        */"""
+        if self.ultimo is not None:
+            return
         try:
-            with open(CLIENTES_FILE, newline='', encoding='utf-8') as f:
+            with open(self.ruta, encoding='utf-8') as f:
+                self.ultimo = int(f.read().strip())
+            self.guardado = self.ultimo
+            return
+        except (FileNotFoundError, ValueError):
+            pass
+
+        max_id = 0
+        if os.path.exists(self.ruta_csv):
+            with open(self.ruta_csv, newline='', encoding='utf-8', errors='replace') as f:
                 lector = csv.DictReader(f)
                 for fila in lector:
                     try:
@@ -258,9 +1967,357 @@ def siguiente_id_clientes():
                             max_id = valor
                     except Exception:
                         continue
-        except FileNotFoundError:
-            pass
-    return max_id + 1
+        self.ultimo = max_id
+        self.guardar()
+
+    def guardar(self):
+        """/**
+        * Escribe el contador en un temporal y lo renombra para no dejarlo a medias.
+        * No hace nada si no ha cambiado desde la ultima vez.
+        * @return None
+        */"""
+        if self.ultimo is None or self.ultimo == self.guardado:
+            return
+        carpeta = os.path.dirname(self.ruta)
+        if carpeta and not os.path.exists(carpeta):
+            os.makedirs(carpeta, exist_ok=True)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(str(self.ultimo))
+        os.replace(temporal, self.ruta)
+        self.guardado = self.ultimo
+
+    def asegurar_minimo(self, valor):
+        """/**
+        * Avanza el contador si ya existe un id mayor (por ejemplo en el CSV).
+        * @param valor id mas alto conocido.
+        * @return None
+        */"""
+        self._cargar()
+        if valor > self.ultimo:
+            self.ultimo = valor
+            self.guardar()
+
+    def reservar(self, cantidad=1, guardar=True):
+        """/**
+        * Reserva un bloque de ids consecutivos.
+        * @param cantidad numero de ids a reservar.
+        * @param guardar False para dejar la escritura del contador para mas
+        *        tarde (la hace EscritorClientes antes de confirmar las filas).
+        * @return primer id del bloque.
+        */"""
+        self._cargar()
+        primero = self.ultimo + 1
+        self.ultimo += cantidad
+        if guardar:
+            self.guardar()
+        return primero
+
+
+def _secuencia_clientes():
+    """/**
+    * Devuelve la secuencia de ids de clientes, creandola si hace falta.
+    * @return objeto SecuenciaIds.
+    */"""
+    global secuencia_clientes
+    if (secuencia_clientes is None or secuencia_clientes.ruta != SECUENCIA_CLIENTES_FILE
+            or secuencia_clientes.ruta_csv != CLIENTES_FILE):
+        secuencia_clientes = SecuenciaIds(SECUENCIA_CLIENTES_FILE, CLIENTES_FILE)
+    return secuencia_clientes
+
+
+def siguiente_id_clientes(guardar=True):
+    """/**
+    * Reserva el siguiente id disponible para clientes en tiempo constante.
+    * @param guardar False si el contador se guardara al confirmar las filas.
+    * @return entero con el nuevo id.
+    */"""
+    return _secuencia_clientes().reservar(guardar=guardar)
+
+
+class EscritorClientes:
+    """/**
+    * Escritor de clientes.csv que se mantiene abierto y agrupa las altas:
+    * las filas pendientes se escriben juntas cuando hay max_pendientes o
+    * cuando la mas antigua lleva max_espera segundos esperando.
+    * Cada confirmacion es un solo write en modo append seguido de fsync,
+    * asi nunca queda una fila a medias. Al abrir añade el salto de linea
+    * que falte al final del fichero, sin borrar nada.
+    * @param ruta CSV de clientes.
+    * @param secuencia SecuenciaIds que se guarda antes de cada confirmacion.
+    * @param max_pendientes filas que fuerzan una confirmacion.
+    * @param max_espera segundos maximos que espera una fila sin escribirse.
+    */"""
+    def __init__(self, ruta, secuencia=None, max_pendientes=100, max_espera=1.0):
+        self.ruta = ruta
+        self.secuencia = secuencia
+        self.max_pendientes = max_pendientes
+        self.max_espera = max_espera
+        self.pendientes = []
+        self.descriptor = None
+        self.necesita_cabecera = False
+        self.temporizador = None
+        self.cerrojo = threading.RLock()
+
+    def _abrir(self):
+        """/**
+        * Abre el fichero en modo append la primera vez y lo repara si hace falta.
+        * @return None
+        */"""
+        if self.descriptor is not None:
+            return
+        carpeta = os.path.dirname(self.ruta)
+        if carpeta and not os.path.exists(carpeta):
+            os.makedirs(carpeta, exist_ok=True)
+        self.descriptor = os.open(self.ruta, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self.necesita_cabecera = os.fstat(self.descriptor).st_size == 0
+        if not self.necesita_cabecera:
+            self._reparar_final()
+
+    def _reparar_final(self):
+        """/**
+        * Si el fichero no acaba en salto de linea (escrito a mano o cortado a
+        * medias) le añade uno, para que la siguiente fila no se pegue a la
+        * ultima. Nunca se borra nada: si la ultima linea esta cortada, al
+        * cargar se rechaza y aparece en el informe de errores.
+        * @return None
+        */"""
+        with open(self.ruta, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+        os.write(self.descriptor, b'\r\n')
+        os.fsync(self.descriptor)
+        print("Se ha añadido un salto de linea al final de", os.path.basename(self.ruta))
+
+    def agregar(self, cliente):
+        """/**
+        * Deja un cliente pendiente de escribir y confirma si toca.
+        * @param cliente Cliente a guardar.
+        * @return None
+        */"""
+        self.agregar_varios([cliente])
+
+    def agregar_varios(self, nuevos):
+        """/**
+        * Deja varios clientes pendientes de escribir y confirma si toca.
+        * @param nuevos lista de objetos Cliente.
+        * @return None
+        */"""
+        with self.cerrojo:
+            self.pendientes.extend(nuevos)
+            if len(self.pendientes) >= self.max_pendientes:
+                self.confirmar()
+            elif self.temporizador is None and self.pendientes:
+                self.temporizador = threading.Timer(self.max_espera, self.confirmar)
+                self.temporizador.daemon = True
+                self.temporizador.start()
+
+    def confirmar(self):
+        """/**
+        * Escribe de una vez todas las filas pendientes y hace fsync.
+        * Antes guarda el contador de ids, para no repetir ids tras un corte.
+        * @return numero de filas escritas.
+        */"""
+        with self.cerrojo:
+            if self.temporizador is not None:
+                self.temporizador.cancel()
+                self.temporizador = None
+            if not self.pendientes:
+                return 0
+            self._abrir()
+            if self.secuencia is not None:
+                self.secuencia.guardar()
+            texto = io.StringIO()
+            escritor = csv.writer(texto)
+            if self.necesita_cabecera:
+                escritor.writerow(['id', 'nombre', 'email', 'fecha_alta'])
+            escritor.writerows(
+                [cliente.id, cliente.nombre, cliente.email, cliente.fecha_alta.isoformat()]
+                for cliente in self.pendientes
+            )
+            datos = memoryview(texto.getvalue().encode('utf-8'))
+            while datos:
+                escritos = os.write(self.descriptor, datos)
+                datos = datos[escritos:]
+            os.fsync(self.descriptor)
+            self.necesita_cabecera = False
+            escritas = len(self.pendientes)
+            self.pendientes = []
+            return escritas
+
+    def cerrar(self):
+        """/**
+        * Confirma lo pendiente y cierra el fichero.
+        * @return None
+        */"""
+        with self.cerrojo:
+            self.confirmar()
+            if self.descriptor is not None:
+                os.close(self.descriptor)
+                self.descriptor = None
+
+
+def _escritor_clientes():
+    """/**
+    * Devuelve el escritor de clientes.csv, creandolo si hace falta.
+    * @return objeto EscritorClientes.
+    */"""
+    global escritor_clientes
+    if escritor_clientes is None or escritor_clientes.ruta != CLIENTES_FILE:
+        if escritor_clientes is not None:
+            escritor_clientes.cerrar()
+        escritor_clientes = EscritorClientes(CLIENTES_FILE, _secuencia_clientes())
+    return escritor_clientes
+
+
+def confirmar_clientes():
+    """/**
+    * Escribe en disco las altas de clientes que esten pendientes.
+    * @return None
+    */"""
+    if escritor_clientes is not None:
+        escritor_clientes.confirmar()
+
+
+def _busqueda_clientes():
+    """/**
+    * Devuelve los indices de busqueda de clientes, rehaciendolos si el
+    * diccionario de clientes se ha sustituido (por ejemplo al cargar datos).
+    * @return objeto IndiceBusquedaClientes.
+    */"""
+    global busqueda_clientes
+    if busqueda_clientes is None or busqueda_clientes.clientes is not clientes:
+        busqueda_clientes = IndiceBusquedaClientes(clientes)
+    return busqueda_clientes
+
+
+def email_registrado(email):
+    """/**
+    * Comprueba en O(1) si ya hay un cliente con ese email.
+    * @param email correo a comprobar.
+    * @return True si ya esta registrado.
+    */"""
+    return _busqueda_clientes().id_por_email(email) is not None
+
+
+def buscar_clientes(prefijo, limite=20):
+    """/**
+    * Busca clientes por el principio de su nombre o de cualquiera de sus
+    * palabras, sin distinguir mayusculas ni acentos.
+    * @param prefijo texto a buscar.
+    * @param limite numero maximo de resultados.
+    * @return lista de clientes.
+    */"""
+    return _busqueda_clientes().buscar_nombre(prefijo, limite)
+
+
+def buscar_cliente():
+    """/**
+    * Pide un texto y enseña los clientes cuyo nombre empieza asi.
+    * @return None
+    */"""
+    if not clientes:
+        print("No hay clientes cargados")
+        return
+    prefijo = input("Nombre (o principio del nombre): ").strip()
+    if not prefijo:
+        print("Introduce un texto")
+        return
+    encontrados = buscar_clientes(prefijo)
+    if not encontrados:
+        print("No hay clientes con ese nombre")
+        return
+    for cliente in encontrados:
+        print(cliente)
+
+
+def registrar_cliente(nombre, email, fecha_alta):
+    """/**
+    * Da de alta un cliente sin pedir nada por consola. La fila se escribe
+    * en clientes.csv junto con otras altas cercanas (ver EscritorClientes).
+    * @param nombre nombre completo (obligatorio).
+    * @param email correo, tiene que pasar validar_email.
+    * @param fecha_alta fecha de alta como date.
+    * @return el Cliente creado; lanza ValueError si los datos no son validos
+    *         o si el email ya esta registrado.
+    */"""
+    nombre = nombre.strip()
+    email = email.strip()
+    if not nombre:
+        raise ValueError("El nombre es obligatorio")
+    if not validar_email(email):
+        raise ValueError("Email no valido")
+    indice = _busqueda_clientes()
+    if indice.id_por_email(email) is not None:
+        raise ValueError("Ese email ya esta registrado")
+
+    cliente = Cliente(siguiente_id_clientes(guardar=False), nombre, email, fecha_alta)
+    clientes[cliente.id] = cliente
+    nueva_version_datos()
+    indice.agregar(cliente)
+    if base_datos is not None:
+        base_datos.agregar_clientes([cliente])
+    _escritor_clientes().agregar(cliente)
+    return cliente
+
+
+def importar_clientes(origen):
+    """/**
+    * Da de alta muchos clientes de golpe desde un CSV o desde un iterable.
+    * Reserva todos los ids a la vez y los escribe con un solo append
+    * confirmado en disco al terminar.
+    * Las filas con datos no validos o con un email ya registrado se saltan.
+    * @param origen ruta a un CSV con columnas nombre, email y fecha_alta,
+    *        o iterable de diccionarios o tuplas (nombre, email, fecha_alta).
+    * @return tupla (clientes creados, numero de filas rechazadas).
+    */"""
+    if isinstance(origen, str):
+        with open(origen, newline='', encoding='utf-8') as f:
+            return importar_clientes(list(csv.DictReader(f)))
+
+    indice = _busqueda_clientes()
+    emails_nuevos = set()
+    validos = []
+    rechazados = 0
+    for fila in origen:
+        try:
+            if isinstance(fila, dict):
+                nombre, email, fecha_alta = fila['nombre'], fila['email'], fila['fecha_alta']
+            else:
+                nombre, email, fecha_alta = fila
+            nombre = nombre.strip()
+            email = email.strip()
+            if isinstance(fecha_alta, str):
+                fecha_alta = parse_fecha_rapida(fecha_alta)
+            if not nombre or not validar_email(email):
+                raise ValueError("datos no validos")
+            clave = clave_email(email)
+            if clave in emails_nuevos or indice.id_por_email(email) is not None:
+                raise ValueError("email repetido")
+        except Exception:
+            rechazados += 1
+            continue
+        emails_nuevos.add(clave)
+        validos.append((nombre, email, fecha_alta))
+
+    if not validos:
+        return [], rechazados
+
+    primero = _secuencia_clientes().reservar(len(validos), guardar=False)
+    nueva_version_datos()
+    nuevos = []
+    for desplazamiento, (nombre, email, fecha_alta) in enumerate(validos):
+        cliente = Cliente(primero + desplazamiento, nombre, email, fecha_alta)
+        clientes[cliente.id] = cliente
+        nuevos.append(cliente)
+    indice.agregar_varios(nuevos)
+    if base_datos is not None:
+        base_datos.agregar_clientes(nuevos)
+    escritor = _escritor_clientes()
+    escritor.agregar_varios(nuevos)
+    escritor.confirmar()
+    return nuevos, rechazados
 
 
 def alta_cliente():
@@ -277,31 +2334,167 @@ def alta_cliente():
     if not validar_email(email):
         print("Email no valido")
         return
+    if email_registrado(email):
+        print("Ese email ya esta registrado")
+        return
 
     fecha_alta = pedir_fecha("Fecha de alta (YYYY-MM-DD): ")
 
-    nuevo_id = siguiente_id_clientes()
-    cliente = Cliente(nuevo_id, nombre, email, fecha_alta)
-    clientes[nuevo_id] = cliente
+    cliente = registrar_cliente(nombre, email, fecha_alta)
+    print("Cliente creado con id", cliente.id)
 
-    carpeta = os.path.dirname(CLIENTES_FILE)
-    if carpeta and not os.path.exists(carpeta):
-        os.makedirs(carpeta, exist_ok=True)
 
-    archivo_existia = os.path.exists(CLIENTES_FILE)
-    with open(CLIENTES_FILE, 'a', newline='', encoding='utf-8') as f:
-        campos = ['id', 'nombre', 'email', 'fecha_alta']
-        escritor = csv.DictWriter(f, fieldnames=campos)
-        if not archivo_existia:
-            escritor.writeheader()
-        escritor.writerow({
-            'id': cliente.id,
-            'nombre': cliente.nombre,
-            'email': cliente.email,
-            'fecha_alta': cliente.fecha_alta.isoformat()
-        })
+def actualizar_derivados():
+    """/**
+    * Pone al dia los indices y los totales con las ventas nuevas.
+    * Si el almacen de ventas se ha sustituido, los vuelve a crear.
+    * @return None
+    */"""
+    global indice_fechas, agregados, indice_clientes, indice_eventos, rollup
+    global agenda_eventos
+    if agenda_eventos is None or agenda_eventos.eventos is not eventos:
+        agenda_eventos = AgendaEventos(eventos)
+    if base_datos is not None or ventas is None:
+        return
+    if indice_fechas is None or indice_fechas.ventas is not ventas:
+        indice_fechas = IndiceFechas(ventas)
+        agregados = AgregadosVentas(ventas)
+        indice_clientes = IndicePorColumna(ventas, 'cliente_ids')
+        indice_eventos = IndicePorColumna(ventas, 'evento_ids')
+        rollup = RollupVentas(ventas, eventos)
+        return
+    if rollup.eventos is not eventos:
+        rollup = RollupVentas(ventas, eventos)
+    indice_fechas.actualizar()
+    agregados.actualizar()
+    indice_clientes.actualizar()
+    indice_eventos.actualizar()
+    rollup.actualizar()
+
 
-    print("Cliente creado con id", cliente.id)
+def registrar_venta(venta):
+    """/**
+    * Añade una venta en memoria y actualiza indice y totales.
+    * @param venta objeto Venta a añadir.
+    * @return None
+    */"""
+    global ventas
+    if base_datos is not None:
+        base_datos.agregar_venta(venta)
+        nueva_version_datos()
+        return
+    if ventas is None:
+        ventas = AlmacenVentas()
+    ventas.append(venta)
+    nueva_version_datos()
+    actualizar_derivados()
+
+
+def leer_ventas_nuevas():
+    """/**
+    * Lee solo las filas que se han añadido a ventas.csv desde la ultima
+    * lectura (a partir de ventas.bytes_leidos), las añade al almacen y pone
+    * al dia indices y totales. Una linea sin salto final se deja para la
+    * siguiente llamada porque puede estar a medio escribir. Las filas que
+    * no se pueden leer (tambien por bytes que no son UTF-8) se apuntan en
+    * informe_errores con su numero de fila.
+    * Si el fichero ha encogido se vuelve a cargar todo.
+    * @return numero de ventas nuevas añadidas.
+    */"""
+    if ventas is None or not os.path.exists(VENTAS_FILE):
+        return 0
+    if os.path.getsize(VENTAS_FILE) < ventas.bytes_leidos:
+        print("ventas.csv ha cambiado, se vuelven a cargar los datos")
+        cargar_datos()
+        return 0
+
+    with open(VENTAS_FILE, 'rb') as f:
+        cabecera = next(csv.reader([f.readline().decode('utf-8', errors='replace')]), [])
+        posicion = max(ventas.bytes_leidos, f.tell())
+        f.seek(posicion)
+        lineas = []
+        for linea in f:
+            if not linea.endswith(b'\n'):
+                break
+            posicion += len(linea)
+            lineas.append(linea.decode('utf-8', errors='replace'))
+    if not lineas:
+        return 0
+
+    try:
+        decodificar = compilar_decodificador(ESQUEMA_VENTAS, cabecera)
+    except KeyError as error:
+        fallo_cabecera = error
+        decodificar = None
+
+    antes = len(ventas)
+    validas = []
+    for fila in csv.reader(lineas):
+        if not fila:
+            continue
+        ventas.filas_leidas += 1
+        try:
+            if decodificar is None:
+                raise fallo_cabecera
+            validas.append(decodificar(fila))
+        except Exception as error:
+            if informe_errores is not None:
+                informe_errores.registrar('ventas', ventas.filas_leidas, error)
+    if validas:
+        ventas.extender(*zip(*validas))
+        nueva_version_datos()
+    ventas.bytes_leidos = posicion
+    actualizar_derivados()
+    return len(ventas) - antes
+
+
+def seguir_ventas(intervalo=2.0):
+    """/**
+    * Modo seguimiento: cada pocos segundos mira si hay ventas nuevas al
+    * final de ventas.csv y las incorpora. Se sale con Ctrl+C.
+    * @param intervalo segundos entre comprobaciones.
+    * @return None
+    */"""
+    if base_datos is not None:
+        print("El seguimiento de ventas.csv solo funciona sin --sqlite")
+        return
+    if ventas is None:
+        print("Carga datos primero")
+        return
+    print("Siguiendo ventas.csv (Ctrl+C para volver al menu)")
+    try:
+        while True:
+            nuevas = leer_ventas_nuevas()
+            if nuevas:
+                print(f"{nuevas} ventas nuevas - total {len(ventas)} ventas, "
+                      f"ingresos {round(agregados.ingresos_totales, 2)}")
+            time.sleep(intervalo)
+    except KeyboardInterrupt:
+        print("\nFin del seguimiento")
+
+
+@medido('ventas_en_rango')
+def ventas_en_rango(fecha_inicio, fecha_fin):
+    """/**
+    * Devuelve las ventas entre dos fechas sin pedir nada por consola.
+    * Los rangos ya consultados se sacan de cache_consultas, que los guarda
+    * como tupla y con un maximo de filas en total.
+    * @param fecha_inicio primera fecha del rango (incluida).
+    * @param fecha_fin ultima fecha del rango (incluida).
+    * @return lista nueva de ventas ordenadas por fecha.
+    */"""
+    if fecha_fin < fecha_inicio:
+        return []
+    if not hay_ventas():
+        return []
+
+    def calcular():
+        if base_datos is not None:
+            return tuple(base_datos.ventas_en_rango(fecha_inicio, fecha_fin))
+        actualizar_derivados()
+        return tuple(indice_fechas.rango(fecha_inicio, fecha_fin))
+
+    return list(cache_consultas.obtener(('ventas_en_rango', fecha_inicio, fecha_fin), calcular))
 
 
 def filtrar_ventas_por_rango():
@@ -309,7 +2502,7 @@ def filtrar_ventas_por_rango():
     * Filtra las ventas por un rango de fechas introducido por el usuario.
     * @return lista de ventas que cumplan el rango.
     */"""
-    if not ventas:
+    if not hay_ventas():
         print("No hay ventas en memoria")
         return []
 
@@ -320,10 +2513,8 @@ def filtrar_ventas_por_rango():
         print("La fecha fin debe ser mayor o igual que la fecha inicio")
         return []
 
-    filtradas = []
-    for venta in ventas:
-        if fecha_inicio <= venta.fecha <= fecha_fin:
-            filtradas.append(venta)
+    filtradas = ventas_en_rango(fecha_inicio, fecha_fin)
+    metricas.contar("filtrar_ventas.encontradas", len(filtradas))
 
     if not filtradas:
         print("No se encontraron ventas en ese rango")
@@ -338,33 +2529,134 @@ def filtrar_ventas_por_rango():
     return filtradas
 
 
-def estadisticas():
+def historial_cliente(cliente_id):
+    """/**
+    * Devuelve las compras de un cliente ordenadas por fecha.
+    * @param cliente_id id del cliente.
+    * @return lista de ventas (vacia si no tiene compras).
+    */"""
+    if not hay_ventas():
+        return []
+    if base_datos is not None:
+        return base_datos.ventas_de_cliente(cliente_id)
+    actualizar_derivados()
+    compras = [ventas.venta(i) for i in indice_clientes.buscar(cliente_id)]
+    compras.sort(key=lambda venta: venta.fecha)
+    return compras
+
+
+def valor_cliente(cliente_id):
+    """/**
+    * Calcula lo que ha gastado un cliente en total (valor de vida del cliente).
+    * @param cliente_id id del cliente.
+    * @return tupla (importe total, entradas compradas, numero de compras).
+    */"""
+    if not hay_ventas():
+        return 0, 0, 0
+    if base_datos is not None:
+        return base_datos.valor_cliente(cliente_id)
+    actualizar_derivados()
+    posiciones = indice_clientes.buscar(cliente_id)
+    totales = ventas.totales
+    cantidades = ventas.cantidades
+    importe = 0
+    entradas = 0
+    for i in posiciones:
+        importe += totales[i]
+        entradas += cantidades[i]
+    return importe, entradas, len(posiciones)
+
+
+def ventas_de_evento(evento_id):
+    """/**
+    * Devuelve las ventas de un evento en el orden en que se cargaron.
+    * @param evento_id id del evento.
+    * @return lista de ventas (vacia si no tiene).
+    */"""
+    if not hay_ventas():
+        return []
+    if base_datos is not None:
+        return base_datos.ventas_de_evento(evento_id)
+    actualizar_derivados()
+    return [ventas.venta(i) for i in indice_eventos.buscar(evento_id)]
+
+
+def pedir_id(mensaje):
+    """/**
+    * Solicita un id numerico al usuario hasta que sea valido.
+    * @param mensaje texto que se muestra por input.
+    * @return entero introducido.
+    */"""
+    while True:
+        texto = input(mensaje).strip()
+        if texto.isdigit():
+            return int(texto)
+        print("Introduce un numero")
+
+
+def consultar_cliente():
     """/**
-    * Calcula estadisticas generales sobre las ventas y eventos.
+    * Enseña el historial de compras y el gasto total de un cliente.
     * @return None
     */"""
-    if not ventas or not eventos:
-        print("Carga datos primero")
+    if not hay_ventas():
+        print("No hay ventas en memoria")
+        return
+    cliente_id = pedir_id("Id del cliente: ")
+    datos_cliente = clientes.get(cliente_id)
+    if datos_cliente:
+        print(datos_cliente)
+    compras = historial_cliente(cliente_id)
+    if not compras:
+        print("Ese cliente no tiene compras")
         return
+    for venta in compras:
+        datos_evento = eventos.get(venta.evento_id)
+        nombre_evento = datos_evento.nombre if datos_evento else "?"
+        print(f"{venta.fecha} - {nombre_evento} - {venta.cantidad} entradas - {venta.total}")
+    importe, entradas, compras_totales = valor_cliente(cliente_id)
+    print(f"Total gastado: {round(importe, 2)} euros en {compras_totales} compras ({entradas} entradas)")
+
+
+def consultar_evento():
+    """/**
+    * Enseña las ventas de un evento.
+    * @return None
+    */"""
+    if not hay_ventas():
+        print("No hay ventas en memoria")
+        return
+    evento_id = pedir_id("Id del evento: ")
+    lista = ventas_de_evento(evento_id)
+    if not lista:
+        print("Ese evento no tiene ventas")
+        return
+    for venta in lista:
+        datos_cliente = clientes.get(venta.cliente_id)
+        nombre_cliente = datos_cliente.nombre if datos_cliente else "?"
+        print(f"{venta.fecha} - {nombre_cliente} - {venta.cantidad} entradas - {venta.total}")
+    print("Ventas del evento:", len(lista))
 
-    ingresos_totales = 0
-    ingresos_evento = {}
-    unidades_evento = {}
 
-    for venta in ventas:
-        ingresos_totales += venta.total
-        ingresos_evento[venta.evento_id] = ingresos_evento.get(venta.evento_id, 0) + venta.total
-        unidades_evento[venta.evento_id] = unidades_evento.get(venta.evento_id, 0) + venta.cantidad
+def calcular_estadisticas():
+    """/**
+    * Prepara las lineas de las estadisticas generales de ventas y eventos.
+    * @return lista de cadenas.
+    */"""
+    actualizar_derivados()
+    if base_datos is not None:
+        ingresos_totales, ingresos_evento, unidades_evento = base_datos.totales_por_evento()
+    else:
+        ingresos_totales = agregados.ingresos_totales
+        ingresos_evento = agregados.ingresos_evento
+        unidades_evento = agregados.unidades_evento
 
     categorias = set()
     precios = []
-    dias_proximos = []
 
     for evento in eventos.values():
         categorias.add(evento.categoria)
         precios.append(evento.precio)
-        if evento.fecha >= date.today():
-            dias_proximos.append(evento.dias_hasta_evento())
 
     if precios:
         precio_min = min(precios)
@@ -373,47 +2665,146 @@ def estadisticas():
     else:
         precio_min = precio_max = precio_media = 0
 
-    if dias_proximos:
-        dias_proximo_evento = min(dias_proximos)
+    hoy = fecha_hoy()
+    siguiente = agenda_eventos.proximos(hoy, 1)
+    if siguiente:
+        dias_proximo_evento = siguiente[0].dias_hasta_evento(hoy)
     else:
         dias_proximo_evento = None
 
-    print("Ingresos totales:", round(ingresos_totales, 2))
-    print("Ingresos por evento:")
+    lineas = [f"Ingresos totales: {round(ingresos_totales, 2)}", "Ingresos por evento:"]
     for evento_id, total in ingresos_evento.items():
         datos_evento = eventos.get(evento_id)
         nombre_evento = datos_evento.nombre if datos_evento else "?"
         unidades = unidades_evento.get(evento_id, 0)
-        print(f"  {nombre_evento}: {round(total, 2)} euros ({unidades} unidades)")
+        lineas.append(f"  {nombre_evento}: {round(total, 2)} euros ({unidades} unidades)")
 
     if categorias:
-        print("Categorias registradas:", ", ".join(sorted(categorias)))
+        lineas.append("Categorias registradas: " + ", ".join(sorted(categorias)))
     else:
-        print("No hay categorias cargadas")
+        lineas.append("No hay categorias cargadas")
 
     if dias_proximo_evento is None:
-        print("No hay eventos futuros")
+        lineas.append("No hay eventos futuros")
     else:
-        print("Dias hasta el proximo evento:", dias_proximo_evento)
+        lineas.append(f"Dias hasta el proximo evento: {dias_proximo_evento}")
 
-    print(f"Resumen precios (min, max, media): ({precio_min}, {precio_max}, {round(precio_media, 2)})")
+    lineas.append(f"Resumen precios (min, max, media): ({precio_min}, {precio_max}, {round(precio_media, 2)})")
+    return lineas
 
 
-def exportar_informe():
+@medido('estadisticas')
+def estadisticas():
     """/**
-    * Genera el informe resumen en CSV con totales por evento.
+    * Enseña estadisticas generales sobre las ventas y eventos. Se
+    * recalculan solo si los datos o el dia de hoy han cambiado.
     * @return None
     */"""
-    if not ventas:
-        print("No hay ventas para exportar")
+    if not hay_ventas() or not eventos:
+        print("Carga datos primero")
         return
 
-    ingresos_evento = {}
-    unidades_evento = {}
-    for venta in ventas:
-        ingresos_evento[venta.evento_id] = ingresos_evento.get(venta.evento_id, 0) + venta.total
-        unidades_evento[venta.evento_id] = unidades_evento.get(venta.evento_id, 0) + venta.cantidad
+    for linea in cache_consultas.obtener(('estadisticas', fecha_hoy()), calcular_estadisticas):
+        print(linea)
+
+
+def proximos_eventos(cantidad=5):
+    """/**
+    * @param cantidad numero maximo de eventos.
+    * @return lista con los proximos eventos a partir de hoy, por fecha.
+    */"""
+    actualizar_derivados()
+    return agenda_eventos.proximos(fecha_hoy(), cantidad)
+
+
+def eventos_en_dias(dias):
+    """/**
+    * @param dias dias a mirar hacia delante desde hoy.
+    * @return lista de eventos que se celebran en ese plazo, por fecha.
+    */"""
+    actualizar_derivados()
+    return agenda_eventos.en_dias(fecha_hoy(), dias)
+
+
+def mostrar_proximos_eventos():
+    """/**
+    * Pide un numero de dias y enseña los eventos que caen en ese plazo.
+    * @return None
+    */"""
+    if not eventos:
+        print("Carga datos primero")
+        return
+    texto = input("Dias hacia delante (vacio para los 5 proximos): ").strip()
+    if texto:
+        try:
+            dias = int(texto)
+        except ValueError:
+            print("Numero no valido")
+            return
+        lista = eventos_en_dias(dias)
+    else:
+        lista = proximos_eventos()
+    if not lista:
+        print("No hay eventos futuros")
+        return
+    hoy = fecha_hoy()
+    for evento in lista:
+        print(evento.texto(hoy))
+
+
+def totales_en_rango(fecha_inicio, fecha_fin, categoria=None):
+    """/**
+    * Ingresos y unidades vendidos entre dos fechas sin recorrer las ventas.
+    * @param fecha_inicio primera fecha del rango (incluida).
+    * @param fecha_fin ultima fecha del rango (incluida).
+    * @param categoria categoria de evento o None para todas.
+    * @return tupla (ingresos, unidades).
+    */"""
+    if not hay_ventas() or fecha_fin < fecha_inicio:
+        return 0.0, 0
+    if base_datos is not None:
+        return base_datos.totales(fecha_inicio, fecha_fin, categoria)
+    actualizar_derivados()
+    return rollup.totales(fecha_inicio, fecha_fin, categoria)
+
+
+def resumen_por_fechas():
+    """/**
+    * Informe de ventas entre dos fechas: total, por categoria y por mes.
+    * @return None
+    */"""
+    if not hay_ventas():
+        print("Carga datos primero")
+        return
 
+    fecha_inicio = pedir_fecha("Fecha inicio (YYYY-MM-DD): ")
+    fecha_fin = pedir_fecha("Fecha fin (YYYY-MM-DD): ")
+    if fecha_fin < fecha_inicio:
+        print("La fecha fin debe ser mayor o igual que la fecha inicio")
+        return
+
+    ingresos, unidades = totales_en_rango(fecha_inicio, fecha_fin)
+    print(f"Ingresos entre {fecha_inicio} y {fecha_fin}: {round(ingresos, 2)} euros ({unidades} unidades)")
+    if not unidades:
+        return
+    fuente = base_datos if base_datos is not None else rollup
+    print("Por categoria:")
+    for categoria in fuente.categorias():
+        ingresos, unidades = fuente.totales(fecha_inicio, fecha_fin, categoria)
+        if unidades:
+            print(f"  {categoria}: {round(ingresos, 2)} euros ({unidades} unidades)")
+    print("Por mes:")
+    for mes, ingresos, unidades in fuente.por_mes(fecha_inicio, fecha_fin):
+        print(f"  {mes}: {round(ingresos, 2)} euros ({unidades} unidades)")
+
+
+def _escribir_informe(ingresos_evento, unidades_evento):
+    """/**
+    * Escribe INFORME_FILE con una fila por evento.
+    * @param ingresos_evento diccionario evento_id -> ingresos, en el orden del informe.
+    * @param unidades_evento diccionario evento_id -> unidades.
+    * @return None
+    */"""
     carpeta = os.path.dirname(INFORME_FILE)
     if carpeta and not os.path.exists(carpeta):
         os.makedirs(carpeta, exist_ok=True)
@@ -426,9 +2817,182 @@ def exportar_informe():
             nombre_evento = datos_evento.nombre if datos_evento else f"Evento {evento_id}"
             escritor.writerow([evento_id, nombre_evento, round(total, 2), unidades_evento.get(evento_id, 0)])
 
+
+@medido('exportar_informe')
+def exportar_informe():
+    """/**
+    * Genera el informe resumen en CSV con totales por evento.
+    * Si se ha elegido un numero de procesos (procesos_informe) el informe
+    * se calcula directamente del CSV de ventas repartido en trozos.
+    * @return None
+    */"""
+    if procesos_informe:
+        exportar_informe_paralelo(procesos_informe)
+        return
+
+    if not hay_ventas():
+        print("No hay ventas para exportar")
+        return
+
+    if base_datos is not None:
+        _, ingresos_evento, unidades_evento = base_datos.totales_por_evento()
+        _escribir_informe(ingresos_evento, unidades_evento)
+        print("Informe creado en", INFORME_FILE)
+        return
+
+    actualizar_derivados()
+    _escribir_informe(agregados.ingresos_evento, agregados.unidades_evento)
     print("Informe creado en", INFORME_FILE)
 
 
+def trozos_fichero(ruta, partes):
+    """/**
+    * Divide un CSV en rangos de bytes que empiezan y acaban en un salto de
+    * linea, saltando la cabecera. No sirve si algun campo lleva saltos de
+    * linea entre comillas.
+    * @param ruta fichero a dividir.
+    * @param partes numero de trozos deseado.
+    * @return tupla (cabecera como lista de columnas, lista de (inicio, fin)).
+    */"""
+    with open(ruta, 'rb') as f:
+        cabecera = next(csv.reader([f.readline().decode('utf-8')]), [])
+        inicio = f.tell()
+        final = f.seek(0, os.SEEK_END)
+        limites = [inicio]
+        paso = (final - inicio) / max(partes, 1)
+        for numero in range(1, partes):
+            f.seek(int(inicio + paso * numero))
+            f.readline()
+            corte = min(f.tell(), final)
+            if corte > limites[-1]:
+                limites.append(corte)
+        if final > limites[-1]:
+            limites.append(final)
+    return cabecera, list(zip(limites, limites[1:]))
+
+
+def _lineas_trozo(ruta, inicio, fin):
+    """/**
+    * Devuelve las lineas de texto de un rango de bytes del fichero.
+    * @return generador de cadenas.
+    */"""
+    with open(ruta, 'rb') as f:
+        f.seek(inicio)
+        posicion = inicio
+        for linea in f:
+            if posicion >= fin:
+                break
+            posicion += len(linea)
+            yield linea.decode('utf-8')
+
+
+def _agregar_trozo(ruta, cabecera, inicio, fin):
+    """/**
+    * Suma ingresos y unidades por evento de un trozo de ventas.csv.
+    * Cada fila se valida con ESQUEMA_VENTAS igual que en cargar_datos,
+    * asi las filas que se rechazan al cargar tampoco cuentan aqui.
+    * @return tupla (sumas parciales de ingresos por evento (ver SumaExacta),
+    *         unidades_evento, primera fila de cada evento dentro del trozo,
+    *         filas rechazadas).
+    */"""
+    decodificar = compilar_decodificador(ESQUEMA_VENTAS, cabecera)
+    sumas_evento = {}
+    unidades_evento = {}
+    primera_fila = {}
+    rechazadas = 0
+    numero = 0
+    for fila in csv.reader(_lineas_trozo(ruta, inicio, fin)):
+        if not fila:
+            continue
+        numero += 1
+        try:
+            _, _, evento_id, cantidad, total, _ = decodificar(fila)
+        except Exception:
+            rechazadas += 1
+            continue
+        suma = sumas_evento.get(evento_id)
+        if suma is None:
+            suma = sumas_evento[evento_id] = SumaExacta()
+            unidades_evento[evento_id] = 0
+            primera_fila[evento_id] = numero
+        suma.agregar(total)
+        unidades_evento[evento_id] += cantidad
+    parciales = {evento_id: suma.parciales for evento_id, suma in sumas_evento.items()}
+    return parciales, unidades_evento, primera_fila, rechazadas
+
+
+def agregar_ventas_por_trozos(ruta, procesos):
+    """/**
+    * Calcula los totales por evento de un CSV de ventas muy grande sin
+    * cargarlo en memoria: lo parte en trozos alineados a lineas, cada
+    * proceso suma su trozo y al final se juntan los parciales en orden.
+    * Los eventos salen en el orden de su primera venta, como en el informe
+    * normal, y los ingresos se juntan con SumaExacta, asi salen los mismos
+    * importes que sumando todas las ventas una detras de otra en memoria.
+    * @param ruta CSV de ventas.
+    * @param procesos numero de procesos a usar.
+    * @return tupla (ingresos_totales, ingresos_evento, unidades_evento, filas rechazadas).
+    */"""
+    cabecera, trozos = trozos_fichero(ruta, procesos)
+    try:
+        compilar_decodificador(ESQUEMA_VENTAS, cabecera)
+    except KeyError:
+        return 0, {}, {}, 0
+
+    if procesos > 1 and len(trozos) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            tareas = [ejecutor.submit(_agregar_trozo, ruta, cabecera, inicio, fin) for inicio, fin in trozos]
+            parciales = [tarea.result() for tarea in tareas]
+    else:
+        parciales = [_agregar_trozo(ruta, cabecera, inicio, fin) for inicio, fin in trozos]
+
+    apariciones = []
+    for numero, (_, _, primera_fila, _) in enumerate(parciales):
+        for evento_id, fila in primera_fila.items():
+            apariciones.append((numero, fila, evento_id))
+    apariciones.sort()
+
+    sumas_evento = {}
+    unidades_evento = {}
+    for _, _, evento_id in apariciones:
+        if evento_id not in sumas_evento:
+            sumas_evento[evento_id] = SumaExacta()
+            unidades_evento[evento_id] = 0
+    rechazadas = 0
+    for parcial_ingresos, parcial_unidades, _, parcial_rechazadas in parciales:
+        for evento_id, sumas_parciales in parcial_ingresos.items():
+            sumas_evento[evento_id].unir(SumaExacta(sumas_parciales))
+            unidades_evento[evento_id] += parcial_unidades[evento_id]
+        rechazadas += parcial_rechazadas
+    ingresos_evento = {evento_id: suma.valor() for evento_id, suma in sumas_evento.items()}
+    ingresos_totales = math.fsum(parcial for suma in sumas_evento.values() for parcial in suma.parciales)
+    return ingresos_totales, ingresos_evento, unidades_evento, rechazadas
+
+
+def exportar_informe_paralelo(procesos):
+    """/**
+    * Genera el mismo informe_resumen.csv que exportar_informe pero leyendo
+    * ventas.csv por trozos en varios procesos.
+    * @param procesos numero de procesos a usar.
+    * @return None
+    */"""
+    global eventos
+    if not os.path.exists(VENTAS_FILE):
+        print("No se encontró ventas.csv")
+        return
+    if not eventos and os.path.exists(EVENTOS_FILE):
+        eventos = _leer_eventos(EVENTOS_FILE)[0]
+
+    _, ingresos_evento, unidades_evento, rechazadas = agregar_ventas_por_trozos(VENTAS_FILE, procesos)
+    if not ingresos_evento:
+        print("No hay ventas para exportar")
+        return
+    _escribir_informe(ingresos_evento, unidades_evento)
+    if rechazadas:
+        print("Filas de ventas rechazadas:", rechazadas)
+    print(f"Informe creado en {INFORME_FILE} ({procesos} procesos)")
+
+
 def mostrar_menu():
     """/**
     * Enseña el menu principal y devuelve la opcion elegida.
@@ -443,26 +3007,74 @@ def mostrar_menu():
     print("6. Filtrar ventas por fechas")
     print("7. Ver estadisticas")
     print("8. Exportar informe")
+    print("10. Historial de un cliente")
+    print("11. Ventas de un evento")
+    print("12. Seguir ventas nuevas")
+    print("13. Resumen de ventas por fechas")
+    print("14. Buscar cliente por nombre")
+    print("15. Proximos eventos")
     print("9. Salir")
     return input("Elige una opcion: ").strip()
 
 
 def main():
     """/**
-    * Punto de entrada del programa, mantiene el bucle del menu.
+    * Punto de entrada del programa: lee las opciones de la linea de
+    * comandos y lanza el menu.
+    * @return None
+    */"""
+    global procesos_informe
+    parser = argparse.ArgumentParser(description="Gestion de clientes, eventos y ventas")
+    parser.add_argument('--procesos', type=int, default=0,
+                        help="exporta el informe leyendo ventas.csv por trozos en N procesos")
+    parser.add_argument('--hoy', type=parse_fecha,
+                        help="usa esta fecha (YYYY-MM-DD) como la de hoy")
+    parser.add_argument('--sqlite', nargs='?', const='', metavar='RUTA',
+                        help="guarda los datos en SQLite (por defecto data/datos.db) en vez de en memoria")
+    parser.add_argument('--metricas', metavar='RUTA',
+                        help="guarda tiempos y contadores al salir (.json o texto Prometheus)")
+    parser.add_argument('--perfil', metavar='RUTA',
+                        help="perfila con cProfile las opciones del menu y guarda el resultado")
+    args = parser.parse_args()
+    procesos_informe = args.procesos
+    if args.hoy:
+        fijar_reloj(args.hoy)
+    if args.sqlite is not None:
+        usar_sqlite(args.sqlite or None)
+    metricas.activo = bool(args.metricas)
+    perfil = cProfile.Profile() if args.perfil else None
+
+    try:
+        bucle_menu(perfil)
+    finally:
+        if perfil:
+            perfil.dump_stats(args.perfil)
+            print("Perfil guardado en", args.perfil)
+        if args.metricas:
+            metricas.exportar(args.metricas)
+            print("Metricas guardadas en", args.metricas)
+
+
+def bucle_menu(perfil=None):
+    """/**
+    * Repite el menu hasta que se elige salir.
+    * @param perfil cProfile.Profile que se enciende solo mientras se
+    * ejecuta cada opcion, o None para no perfilar.
     * @return None
     */"""
     opcion = ''
     while opcion != '9':
         opcion = mostrar_menu()
+        if perfil:
+            perfil.enable()
         if opcion == '1':
             cargar_datos()
         elif opcion == '2':
-            listar('clientes')
+            listar_paginado('clientes')
         elif opcion == '3':
-            listar('eventos')
+            listar_paginado('eventos')
         elif opcion == '4':
-            listar('ventas')
+            listar_paginado('ventas')
         elif opcion == '5':
             alta_cliente()
         elif opcion == '6':
@@ -471,10 +3083,28 @@ def main():
             estadisticas()
         elif opcion == '8':
             exportar_informe()
+        elif opcion == '10':
+            consultar_cliente()
+        elif opcion == '11':
+            consultar_evento()
+        elif opcion == '12':
+            seguir_ventas()
+        elif opcion == '13':
+            resumen_por_fechas()
+        elif opcion == '14':
+            buscar_cliente()
+        elif opcion == '15':
+            mostrar_proximos_eventos()
         elif opcion == '9':
+            confirmar_clientes()
             print("Hasta luego")
         else:
             print("Opcion incorrecta")
+        if perfil:
+            perfil.disable()
+
+
+atexit.register(confirmar_clientes)
 
 
 if __name__ == '__main__':
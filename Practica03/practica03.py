@@ -1,7 +1,25 @@
+import argparse
 import csv
-from typing import List, Set, Dict
+import heapq
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, groupby, islice
+from operator import itemgetter, sub
+from typing import Callable, List, Optional, Set, Dict, Iterable, Iterator
+
+DIAS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+BIT_DIA = {dia: 1 << posicion for posicion, dia in enumerate(DIAS)}
+TAM_BUFFER_INFORMES = 1 << 20
 
 class RegistroHorario:
+    __slots__ = ('empleado', 'dia', 'entrada', 'salida')
+
     def __init__(self, empleado: str, dia: str, entrada: int, salida: int):
         self.empleado = empleado
         self.dia = dia
@@ -14,6 +32,8 @@ class RegistroHorario:
 
 
 class Empleado:
+    __slots__ = ('nombre', 'registros')
+
     def __init__(self, nombre: str):
         self.nombre = nombre
         self.registros: List[RegistroHorario] = []
@@ -35,12 +55,100 @@ class Empleado:
         return [self.nombre, self.dias_trabajados(), self.horas_totales()]
 
 
+class AlmacenRegistros:
+    """Guarda muchos registros horarios de forma compacta: los nombres de empleado y de día se
+    guardan una sola vez y cada registro son cuatro números en arrays (id de empleado, id de día,
+    entrada y salida). Los ids se dan en orden de aparición"""
+
+    def __init__(self):
+        self.nombres: List[str] = []
+        self.ids_empleado: Dict[str, int] = {}
+        self.dias: List[str] = []
+        self.ids_dia: Dict[str, int] = {}
+        self.empleados = array('i')
+        self.dias_registro = array('h')
+        self.entradas = array('h')
+        self.salidas = array('h')
+
+    @classmethod
+    def desde_csv(cls, archivo: str) -> 'AlmacenRegistros':
+        """Lee el CSV de horarios directamente al almacén, sin crear un RegistroHorario por línea"""
+        almacen = cls()
+        try:
+            with open(archivo, newline='', encoding='utf-8') as f:
+                for nombre, dia, h_entrada, h_salida in csv.reader(f, delimiter=';', quotechar='"'):
+                    almacen.agregar(nombre, dia, int(h_entrada), int(h_salida))
+        except FileNotFoundError:
+            print(f"Error: El archivo {archivo} no se encontró")
+        return almacen
+
+    def _id(self, texto: str, ids: Dict[str, int], textos: List[str]) -> int:
+        numero = ids.get(texto)
+        if numero is None:
+            numero = ids[texto] = len(textos)
+            textos.append(texto)
+        return numero
+
+    def agregar(self, empleado: str, dia: str, entrada: int, salida: int):
+        """Añade un registro al final del almacén"""
+        self.empleados.append(self._id(empleado, self.ids_empleado, self.nombres))
+        self.dias_registro.append(self._id(dia, self.ids_dia, self.dias))
+        self.entradas.append(entrada)
+        self.salidas.append(salida)
+
+    def extender(self, registros: Iterable[RegistroHorario]):
+        """Añade varios RegistroHorario"""
+        for registro in registros:
+            self.agregar(registro.empleado, registro.dia, registro.entrada, registro.salida)
+
+    def __len__(self) -> int:
+        return len(self.entradas)
+
+    def registro(self, posicion: int) -> RegistroHorario:
+        """Devuelve el registro de esa posición como RegistroHorario"""
+        return RegistroHorario(self.nombres[self.empleados[posicion]], self.dias[self.dias_registro[posicion]],
+                               self.entradas[posicion], self.salidas[posicion])
+
+    def __iter__(self) -> Iterator[RegistroHorario]:
+        for posicion in range(len(self)):
+            yield self.registro(posicion)
+
+    def duraciones(self) -> array:
+        """Horas de cada registro (salida - entrada), calculadas de una vez sobre las columnas"""
+        return array('i', map(sub, self.salidas, self.entradas))
+
+    def horas_por_empleado(self) -> array:
+        """Suma de horas de cada empleado, indexada por id de empleado"""
+        horas = array('q', bytes(8 * len(self.nombres)))
+        for empleado, duracion in zip(self.empleados, self.duraciones()):
+            horas[empleado] += duracion
+        return horas
+
+    def dias_por_empleado(self) -> List[int]:
+        """Número de días distintos trabajados por cada empleado, indexado por id de empleado"""
+        mascaras = [0] * len(self.nombres)
+        for empleado, dia in zip(self.empleados, self.dias_registro):
+            mascaras[empleado] |= 1 << dia
+        return [bin(mascara).count('1') for mascara in mascaras]
+
+    def resumen(self) -> Iterator[List]:
+        """Filas del resumen por empleado (nombre, días trabajados, horas) en orden de aparición"""
+        return map(list, zip(self.nombres, self.dias_por_empleado(), self.horas_por_empleado()))
+
+
 class GestorHorarios:
     def __init__(self):
         self.empleados: Dict[str, Empleado] = {}
+        self.almacen: Optional[AlmacenRegistros] = None
+
+    def leer_almacen(self, archivo: str):
+        """Lee el archivo CSV a un AlmacenRegistros en vez de crear un Empleado con sus registros"""
+        self.empleados = {}
+        self.almacen = AlmacenRegistros.desde_csv(archivo)
 
     def leer_csv(self, archivo: str):
         """Lee el archivo CSV y agrupa los registros por empleado"""
+        self.almacen = None
         try:
             with open(archivo, newline='', encoding='utf-8') as f:
                 lector = csv.reader(f, delimiter=';', quotechar='"')
@@ -56,39 +164,433 @@ class GestorHorarios:
             print(f"Error: El archivo {archivo} no se encontró")
             self.empleados = {}
 
-    def escribir_resumen(self, archivo_salida: str):
+    def escribir_resumen(self, archivo_salida: str, escritor: Optional['EscritorInformes'] = None):
         """Escribe el resumen en un archivo CSV"""
-        with open(archivo_salida, 'w', newline='', encoding='utf-8') as f:
-            escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            escritor.writerow(['Empleado', 'Dias_trabajados', 'Horas_totales'])
-            for empleado in self.empleados.values():
-                escritor.writerow(empleado.fila_csv())
+        if self.almacen is not None:
+            escribir_filas_resumen(archivo_salida, self.almacen.resumen(), escritor)
+            return
+        escribir_filas_resumen(archivo_salida, (empleado.fila_csv() for empleado in self.empleados.values()), escritor)
 
 
-def leer_registros(archivo: str) -> List[RegistroHorario]:
-    registros = []
+class AnalizadorHorarios:
+    """Calcula todos los informes de horarios recorriendo los registros una sola vez.
+    Con con_resumen=False no guarda días y horas por empleado (para usar resumen_externo)"""
+
+    def __init__(self, hora_referencia: int = 8, horas_turno_largo: int = 6, con_resumen: bool = True):
+        self.hora_referencia = hora_referencia
+        self.horas_turno_largo = horas_turno_largo
+        self.con_resumen = con_resumen
+        self.total_registros = 0
+        self.madrugadores: Set[str] = set()
+        self.por_dia: Dict[str, Set[str]] = {}
+        self.dias: Dict[str, Set[str]] = {}
+        self.horas: Dict[str, int] = {}
+        self.turno_largo: Dict[str, bool] = {}
+        self.mascaras: Dict[str, int] = {}
+
+    def agregar(self, registro: RegistroHorario):
+        """Actualiza todos los acumulados con un registro"""
+        empleado = registro.empleado
+        self.total_registros += 1
+        if registro.entrada <= self.hora_referencia:
+            self.madrugadores.add(empleado)
+        if registro.dia not in self.por_dia:
+            self.por_dia[registro.dia] = set()
+        self.por_dia[registro.dia].add(empleado)
+        duracion = registro.duracion()
+        if empleado not in self.mascaras:
+            self.turno_largo[empleado] = True
+            self.mascaras[empleado] = 0
+            if self.con_resumen:
+                self.dias[empleado] = set()
+                self.horas[empleado] = 0
+        self.mascaras[empleado] |= BIT_DIA.get(registro.dia, 0)
+        if self.con_resumen:
+            self.dias[empleado].add(registro.dia)
+            self.horas[empleado] += duracion
+        if duracion < self.horas_turno_largo:
+            self.turno_largo[empleado] = False
+
+    def procesar(self, registros: Iterable[RegistroHorario]) -> 'AnalizadorHorarios':
+        """Recorre los registros una vez y devuelve el propio analizador"""
+        for registro in registros:
+            self.agregar(registro)
+        return self
+
+    def procesar_al_pasar(self, registros: Iterable[RegistroHorario]) -> Iterator[RegistroHorario]:
+        """Devuelve los mismos registros, procesándolos según pasan (para recorrer el fichero una vez)"""
+        for registro in registros:
+            self.agregar(registro)
+            yield registro
+
+    def resumen(self) -> Iterator[List]:
+        """Filas del resumen por empleado (nombre, días trabajados, horas) en orden de aparición"""
+        for empleado, dias in self.dias.items():
+            yield [empleado, len(dias), self.horas[empleado]]
+
+    def turnos_largos(self) -> Set[str]:
+        """Empleados con todos sus turnos de al menos horas_turno_largo horas"""
+        return {empleado for empleado, largo in self.turno_largo.items() if largo}
+
+
+class ExpresionDias:
+    """Condición sobre los días que trabaja un empleado, evaluada sobre su máscara de 7 bits"""
+
+    def __init__(self, condicion: Callable[[int], bool], texto: str):
+        self.condicion = condicion
+        self.texto = texto
+
+    def cumple(self, mascara: int) -> bool:
+        return self.condicion(mascara)
+
+    def __and__(self, otra: 'ExpresionDias') -> 'ExpresionDias':
+        return ExpresionDias(lambda m: self.condicion(m) and otra.condicion(m), f"({self} & {otra})")
+
+    def __or__(self, otra: 'ExpresionDias') -> 'ExpresionDias':
+        return ExpresionDias(lambda m: self.condicion(m) or otra.condicion(m), f"({self} | {otra})")
+
+    def __sub__(self, otra: 'ExpresionDias') -> 'ExpresionDias':
+        return ExpresionDias(lambda m: self.condicion(m) and not otra.condicion(m), f"({self} - {otra})")
+
+    def __str__(self):
+        return self.texto
+
+
+def trabaja(nombre: str) -> ExpresionDias:
+    """Expresión que se cumple si el empleado trabaja ese día"""
+    if nombre not in BIT_DIA:
+        raise ValueError(f"Día desconocido: {nombre}")
+    bit = BIT_DIA[nombre]
+    return ExpresionDias(lambda m: m & bit != 0, nombre)
+
+
+def al_menos(cantidad: int) -> ExpresionDias:
+    """Expresión que se cumple si el empleado trabaja al menos esa cantidad de días distintos"""
+    return ExpresionDias(lambda m: bin(m).count('1') >= cantidad, f"al menos {cantidad}")
+
+
+_PIEZA_EXPRESION = re.compile(r"\s*(?:(al\s+menos\s+(\d+)(?:\s+d[ií]as)?)|([()&|-])|(\w+))", re.IGNORECASE)
+
+
+def parsear_expresion(texto: str) -> ExpresionDias:
+    """Convierte un texto como 'Lunes & Viernes', 'Sábado - Domingo' o 'al menos 5 días' en una expresión.
+    La prioridad es la de Python: primero '-', luego '&' y por último '|'"""
+    piezas = []
+    posicion = 0
+    texto = texto.strip()
+    while posicion < len(texto):
+        encontrado = _PIEZA_EXPRESION.match(texto, posicion)
+        if not encontrado:
+            raise ValueError(f"Expresión no válida cerca de: {texto[posicion:]}")
+        frase, cantidad, operador, nombre = encontrado.groups()
+        if frase:
+            piezas.append(al_menos(int(cantidad)))
+        elif operador:
+            piezas.append(operador)
+        else:
+            nombres = {d.lower(): d for d in DIAS}
+            piezas.append(trabaja(nombres.get(nombre.lower(), nombre)))
+        posicion = encontrado.end()
+    piezas.append(None)
+
+    def siguiente():
+        return piezas[0]
+
+    def tomar():
+        return piezas.pop(0)
+
+    def atomo():
+        pieza = tomar()
+        if pieza == '(':
+            resultado = union()
+            if tomar() != ')':
+                raise ValueError("Falta cerrar un paréntesis")
+            return resultado
+        if isinstance(pieza, ExpresionDias):
+            return pieza
+        raise ValueError(f"Se esperaba un día y se encontró: {pieza or 'el final'}")
+
+    def resta():
+        resultado = atomo()
+        while siguiente() == '-':
+            tomar()
+            resultado = resultado - atomo()
+        return resultado
+
+    def interseccion():
+        resultado = resta()
+        while siguiente() == '&':
+            tomar()
+            resultado = resultado & resta()
+        return resultado
+
+    def union():
+        resultado = interseccion()
+        while siguiente() == '|':
+            tomar()
+            resultado = resultado | interseccion()
+        return resultado
+
+    resultado = union()
+    if siguiente() is not None:
+        raise ValueError(f"Sobra parte de la expresión: {siguiente()}")
+    return resultado
+
+
+class IndiceDias:
+    """Agrupa a los empleados por su máscara de días trabajados (bit 0 = Lunes ... bit 6 = Domingo).
+    Como solo hay 128 máscaras posibles, cada consulta evalúa la expresión una vez por máscara
+    y no una vez por empleado"""
+
+    def __init__(self, mascaras: Dict[str, int]):
+        self.por_mascara: Dict[int, List[str]] = {}
+        for empleado, mascara in mascaras.items():
+            if mascara not in self.por_mascara:
+                self.por_mascara[mascara] = []
+            self.por_mascara[mascara].append(empleado)
+
+    @classmethod
+    def desde_registros(cls, registros: Iterable[RegistroHorario]) -> 'IndiceDias':
+        return cls(AnalizadorHorarios().procesar(registros).mascaras)
+
+    def consultar(self, expresion) -> Set[str]:
+        """Empleados que cumplen la expresión (ExpresionDias o texto para parsear_expresion)"""
+        if isinstance(expresion, str):
+            expresion = parsear_expresion(expresion)
+        resultado = set()
+        for mascara, empleados in self.por_mascara.items():
+            if expresion.cumple(mascara):
+                resultado.update(empleados)
+        return resultado
+
+
+class OrdenacionExterna:
+    """Ordena más tuplas de las que caben en memoria: guarda como mucho `presupuesto` tuplas,
+    y cuando se llena las ordena y las vuelca a un fichero temporal (un tramo). Los tramos se
+    mezclan con heapq.merge de MEZCLA en MEZCLA y cada mezcla se vuelve a escribir en disco como
+    un tramo del nivel siguiente, así nunca hay abiertos más que unos pocos MEZCLA ficheros ni
+    más de MEZCLA bloques en memoria. Si todo cabe en memoria no escribe nada en disco"""
+
+    BLOQUE = 1000
+    MEZCLA = 64
+
+    def __init__(self, presupuesto: int = 100_000, carpeta: Optional[str] = None):
+        self.presupuesto = max(presupuesto, 1)
+        self.carpeta = carpeta
+        self.bloque = max(1, min(self.BLOQUE, self.presupuesto // self.MEZCLA))
+        self.pendientes: List[tuple] = []
+        self.niveles: List[List] = []
+
+    def agregar(self, elemento: tuple):
+        self.pendientes.append(elemento)
+        if len(self.pendientes) >= self.presupuesto:
+            self._volcar()
+
+    def _volcar(self):
+        """Ordena lo que hay en memoria y lo escribe en un tramo nuevo del primer nivel"""
+        self.pendientes.sort()
+        pendientes, self.pendientes = self.pendientes, []
+        self._guardar(0, self._escribir(pendientes))
+
+    def _guardar(self, nivel: int, tramo):
+        """Añade un tramo a su nivel; cuando el nivel junta MEZCLA tramos los mezcla en uno del siguiente"""
+        if nivel == len(self.niveles):
+            self.niveles.append([])
+        self.niveles[nivel].append(tramo)
+        if len(self.niveles[nivel]) >= self.MEZCLA:
+            tramos, self.niveles[nivel] = self.niveles[nivel], []
+            self._guardar(nivel + 1, self._escribir(self._mezclar(tramos)))
+
+    def _escribir(self, ordenados: Iterable[tuple]):
+        """Escribe tuplas ya ordenadas en un fichero temporal, por bloques, y lo deja al principio"""
+        tramo = tempfile.TemporaryFile(dir=self.carpeta)
+        try:
+            iterador = iter(ordenados)
+            while True:
+                bloque = list(islice(iterador, self.bloque))
+                if not bloque:
+                    break
+                pickle.dump(bloque, tramo, pickle.HIGHEST_PROTOCOL)
+            tramo.seek(0)
+        except BaseException:
+            tramo.close()
+            raise
+        return tramo
+
+    def _leer(self, tramo) -> Iterator[tuple]:
+        while True:
+            try:
+                bloque = pickle.load(tramo)
+            except EOFError:
+                return
+            yield from bloque
+
+    def _mezclar(self, tramos: List) -> Iterator[tuple]:
+        """Mezcla tramos ordenados; al terminar los cierra y se borran"""
+        try:
+            yield from heapq.merge(*[self._leer(tramo) for tramo in tramos])
+        finally:
+            for tramo in tramos:
+                tramo.close()
+
+    def ordenados(self) -> Iterator[tuple]:
+        """Devuelve todas las tuplas en orden; los ficheros temporales se borran al terminar"""
+        if not self.niveles:
+            self.pendientes.sort()
+            pendientes, self.pendientes = self.pendientes, []
+            yield from pendientes
+            return
+        if self.pendientes:
+            self._volcar()
+        tramos = [tramo for nivel in self.niveles for tramo in nivel]
+        self.niveles = []
+        try:
+            # Quedan menos de MEZCLA tramos por nivel; se mezclan primero los más pequeños
+            # hasta que caben todos en la mezcla final.
+            while len(tramos) > self.MEZCLA:
+                grupo, tramos = tramos[:self.MEZCLA], tramos[self.MEZCLA:]
+                tramos.append(self._escribir(self._mezclar(grupo)))
+            yield from self._mezclar(tramos)
+        finally:
+            for tramo in tramos:
+                tramo.close()
+
+
+def resumen_externo(registros: Iterable[RegistroHorario], presupuesto: int = 100_000,
+                    carpeta: Optional[str] = None) -> Iterator[List]:
+    """Filas del resumen por empleado (nombre, días trabajados, horas) en orden de aparición,
+    igual que AnalizadorHorarios.resumen pero con memoria acotada: primero se ordenan los registros
+    por empleado para agruparlos y después los resultados por primera aparición, las dos veces
+    con OrdenacionExterna"""
+    por_empleado = OrdenacionExterna(presupuesto, carpeta)
+    for posicion, registro in enumerate(registros):
+        por_empleado.agregar((registro.empleado, posicion, registro.dia, registro.duracion()))
+
+    por_aparicion = OrdenacionExterna(presupuesto, carpeta)
+    for empleado, grupo in groupby(por_empleado.ordenados(), key=itemgetter(0)):
+        primera = None
+        dias = set()
+        horas = 0
+        for _, posicion, dia, duracion in grupo:
+            if primera is None:
+                primera = posicion
+            dias.add(dia)
+            horas += duracion
+        por_aparicion.agregar((primera, empleado, len(dias), horas))
+
+    for _, empleado, dias, horas in por_aparicion.ordenados():
+        yield [empleado, dias, horas]
+
+
+def iterar_registros(archivo: str) -> Iterator[RegistroHorario]:
+    """Lee el CSV de horarios y va devolviendo los registros uno a uno"""
     try:
         with open(archivo, newline='', encoding='utf-8') as f:
             lector = csv.reader(f, delimiter=';', quotechar='"')
             for fila in lector:
-                
                 nombre, dia, h_entrada, h_salida = fila
-                entrada = int(h_entrada)
-                salida = int(h_salida)
-                registro = RegistroHorario(nombre, dia, entrada, salida)
-                registros.append(registro)
-
+                yield RegistroHorario(nombre, dia, int(h_entrada), int(h_salida))
     except FileNotFoundError:
         print(f"Error: El archivo {archivo} no se encontró")
-    return registros
 
-def empleados_madrugadores(registros: List[RegistroHorario], hora_referencia: int) -> Set[str]:
+
+def leer_registros(archivo: str) -> List[RegistroHorario]:
+    return list(iterar_registros(archivo))
+
+
+def escribir_csv_atomico(archivo_salida: str, cabecera: List[str], filas: Iterable[List]):
+    """Escribe el CSV en un fichero temporal de la misma carpeta y lo renombra al final,
+    así nunca queda un informe a medio escribir aunque el programa se corte"""
+    carpeta, nombre = os.path.split(archivo_salida)
+    temporal = os.path.join(carpeta, f".{nombre}.{os.getpid()}.{threading.get_ident()}.tmp")
+    f = open(temporal, 'x', newline='', encoding='utf-8', buffering=TAM_BUFFER_INFORMES)
+    try:
+        with f:
+            escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            escritor.writerow(cabecera)
+            escritor.writerows(filas)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, archivo_salida)
+    except BaseException:
+        os.remove(temporal)
+        raise
+
+
+def copiar_atomico(origen: str, destino: str):
+    """Copia un fichero ya escrito a otro nombre con el mismo cuidado que escribir_csv_atomico"""
+    carpeta, nombre = os.path.split(destino)
+    temporal = os.path.join(carpeta, f".{nombre}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copyfile(origen, temporal)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+class EscritorInformes:
+    """Escribe los ficheros de informe en paralelo con un grupo de hilos. Los registros ya se han
+    leído cuando se encargan los ficheros; lo que se solapa con la escritura son las consultas que
+    quedan y los demás ficheros. Cada fichero se escribe de forma atómica (ver escribir_csv_atomico).
+    Se usa con with: al salir espera a que terminen todos y relanza el primer error"""
+
+    def __init__(self, hilos: int = 4):
+        self.ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='informes')
+        self.pendientes: List[Future] = []
+
+    def enviar(self, archivo_salida: str, cabecera: List[str], filas: Iterable[List]) -> Future:
+        """Encarga la escritura de un fichero. Las filas se copian aquí para que el hilo
+        no lea datos que el programa pueda seguir modificando"""
+        tarea = self.ejecutor.submit(escribir_csv_atomico, archivo_salida, cabecera, list(filas))
+        self.pendientes.append(tarea)
+        return tarea
+
+    def copiar(self, origen: str, destino: str) -> Future:
+        """Encarga la copia de un fichero que ya está escrito (ver copiar_atomico)"""
+        tarea = self.ejecutor.submit(copiar_atomico, origen, destino)
+        self.pendientes.append(tarea)
+        return tarea
+
+    def esperar(self):
+        """Espera a que se escriban todos los ficheros encargados"""
+        pendientes, self.pendientes = self.pendientes, []
+        for tarea in pendientes:
+            tarea.result()
+
+    def __enter__(self) -> 'EscritorInformes':
+        return self
+
+    def __exit__(self, *excepcion):
+        try:
+            self.esperar()
+        finally:
+            self.ejecutor.shutdown()
+        return False
+
+
+def escribir_empleados(archivo_salida: str, empleados: Iterable[str], escritor: Optional[EscritorInformes] = None):
+    """Escribe un CSV con una columna de nombres de empleado (en segundo plano si se pasa un escritor)"""
+    filas = ([empleado] for empleado in empleados)
+    if escritor is not None:
+        escritor.enviar(archivo_salida, ['Empleado'], filas)
+    else:
+        escribir_csv_atomico(archivo_salida, ['Empleado'], filas)
+
+
+def escribir_filas_resumen(archivo_salida: str, filas: Iterable[List], escritor: Optional[EscritorInformes] = None):
+    """Escribe un CSV de resumen con días trabajados y horas por empleado (en segundo plano si se pasa un escritor)"""
+    cabecera = ['Empleado', 'Dias_trabajados', 'Horas_totales']
+    if escritor is not None:
+        escritor.enviar(archivo_salida, cabecera, filas)
+    else:
+        escribir_csv_atomico(archivo_salida, cabecera, filas)
+
+def empleados_madrugadores(registros: List[RegistroHorario], hora_referencia: int,
+                           escritor: Optional[EscritorInformes] = None) -> Set[str]:
     madrugadores = {r.empleado for r in registros if r.entrada <= hora_referencia}
-    with open('Practica03/resource/madrugadores.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        escritor.writerow(['Empleado'])
-        for empleado in madrugadores:
-            escritor.writerow([empleado])
+    escribir_empleados('Practica03/resource/madrugadores.csv', madrugadores, escritor)
     return madrugadores
 
 def empleados_por_dia(registros: List[RegistroHorario]) -> Dict[str, Set[str]]:
@@ -99,43 +601,29 @@ def empleados_por_dia(registros: List[RegistroHorario]) -> Dict[str, Set[str]]:
         empleados_por_dia[registro.dia].add(registro.empleado)
     return empleados_por_dia
 
-def empleados_lunes_y_viernes(empleados_por_dia: Dict[str, Set[str]]):
+def empleados_lunes_y_viernes(empleados_por_dia: Dict[str, Set[str]], escritor: Optional[EscritorInformes] = None):
     lunes = empleados_por_dia.get('Lunes', set())
     viernes = empleados_por_dia.get('Viernes', set())
     interseccion = lunes & viernes
-    with open('Practica03/resource/en_dos_dias.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        escritor.writerow(['Empleado'])
-        for empleado in interseccion:
-            escritor.writerow([empleado])
+    escribir_empleados('Practica03/resource/en_dos_dias.csv', interseccion, escritor)
     return interseccion
 
-def empleados_sabado_no_domingo(empleados_por_dia: Dict[str, Set[str]]):
+def empleados_sabado_no_domingo(empleados_por_dia: Dict[str, Set[str]], escritor: Optional[EscritorInformes] = None):
     sabado = empleados_por_dia.get('Sábado', set())
     domingo = empleados_por_dia.get('Domingo', set())
     diferencia = sabado - domingo
-    with open('Practica03/resource/exclusivos_sabado_no_domingo.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        escritor.writerow(['Empleado'])
-        for empleado in diferencia:
-            escritor.writerow([empleado])
+    escribir_empleados('Practica03/resource/exclusivos_sabado_no_domingo.csv', diferencia, escritor)
     return diferencia
 
-def resumen_semanal(registros: List[RegistroHorario]):
-    resumen = {}
-    for registro in registros:
-        if registro.empleado not in resumen:
-            resumen[registro.empleado] = {'dias': set(), 'horas': 0}
-        resumen[registro.empleado]['dias'].add(registro.dia)
-        resumen[registro.empleado]['horas'] += registro.duracion()
-    
-    with open('Practica03/resource/resumen_semanal.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        escritor.writerow(['Empleado', 'Dias_trabajados', 'Horas_totales'])
-        for empleado, datos in resumen.items():
-            escritor.writerow([empleado, len(datos['dias']), datos['horas']])
+def resumen_semanal(registros, escritor: Optional[EscritorInformes] = None):
+    """Escribe resumen_semanal.csv a partir de una lista de RegistroHorario o de un AlmacenRegistros"""
+    if isinstance(registros, AlmacenRegistros):
+        filas = registros.resumen()
+    else:
+        filas = AnalizadorHorarios().procesar(registros).resumen()
+    escribir_filas_resumen('Practica03/resource/resumen_semanal.csv', filas, escritor)
 
-def empleados_turno_largo(registros: List[RegistroHorario]) -> Set[str]:
+def empleados_turno_largo(registros: List[RegistroHorario], escritor: Optional[EscritorInformes] = None) -> Set[str]:
     turnos_por_empleado = {}
     for registro in registros:
         if registro.empleado not in turnos_por_empleado:
@@ -143,45 +631,67 @@ def empleados_turno_largo(registros: List[RegistroHorario]) -> Set[str]:
         turnos_por_empleado[registro.empleado].append(registro.duracion())
     
     empleados_largos = {emp for emp, turnos in turnos_por_empleado.items() if all(t >= 6 for t in turnos)}
-    with open('Practica03/resource/turnos_largos.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        escritor.writerow(['Empleado'])
-        for empleado in empleados_largos:
-            escritor.writerow([empleado])
+    escribir_empleados('Practica03/resource/turnos_largos.csv', empleados_largos, escritor)
     return empleados_largos
 
-def main():
-    
-    registros = leer_registros('Practica03/resource/horarios.csv')
-    if not registros:
-        return
+def main(presupuesto: Optional[int] = None):
+    """Genera todos los informes. Con presupuesto, el resumen por empleado se calcula en streaming
+    con como mucho ese número de registros en memoria (ver resumen_externo)"""
     
     hora_referencia = 8
 
-    madrugadores = empleados_madrugadores(registros, hora_referencia)
-    print(f"Empleados que empiezan antes de las {hora_referencia}: {madrugadores}")
+    registros = iterar_registros('Practica03/resource/horarios.csv')
+    primero = next(registros, None)
+    if primero is None:
+        return
+    registros = chain([primero], registros)
+
+    analizador = AnalizadorHorarios(hora_referencia, con_resumen=presupuesto is None)
+    with EscritorInformes() as escritor:
+        resumen = None
+        if presupuesto is None:
+            analizador.procesar(registros)
+            resumen = list(analizador.resumen())
+        else:
+            # El resumen se escribe a la vez que se leen los registros, sin guardarlo en memoria;
+            # la copia a resumen_clases.csv ya puede ir en segundo plano.
+            filas = resumen_externo(analizador.procesar_al_pasar(registros), presupuesto)
+            escribir_filas_resumen('Practica03/resource/resumen_semanal.csv', filas)
+            escritor.copiar('Practica03/resource/resumen_semanal.csv', 'Practica03/resource/resumen_clases.csv')
 
-    emp_por_dia = empleados_por_dia(registros)
-    for dia, empleados in emp_por_dia.items():
-        print(f"{dia}: {empleados}")
+        madrugadores = analizador.madrugadores
+        escribir_empleados('Practica03/resource/madrugadores.csv', madrugadores, escritor)
+        print(f"Empleados que empiezan antes de las {hora_referencia}: {madrugadores}")
 
-    interseccion = empleados_lunes_y_viernes(emp_por_dia)
-    print(f"Empleados que trabajaron Lunes y Viernes: {interseccion}")
+        emp_por_dia = analizador.por_dia
+        for dia, empleados in emp_por_dia.items():
+            print(f"{dia}: {empleados}")
 
-    exclusivos = empleados_sabado_no_domingo(emp_por_dia)
-    print(f"Empleados que trabajaron Sábado pero no Domingo: {exclusivos}")
-    print("Operación utilizada: Diferencia (sábado - domingo)")
+        indice = IndiceDias(analizador.mascaras)
+        interseccion = indice.consultar(trabaja('Lunes') & trabaja('Viernes'))
+        escribir_empleados('Practica03/resource/en_dos_dias.csv', interseccion, escritor)
+        print(f"Empleados que trabajaron Lunes y Viernes: {interseccion}")
 
-    resumen_semanal(registros)
-    print("Se ha generado el fichero resumen_horarios.csv")
+        exclusivos = indice.consultar(trabaja('Sábado') - trabaja('Domingo'))
+        escribir_empleados('Practica03/resource/exclusivos_sabado_no_domingo.csv', exclusivos, escritor)
+        print(f"Empleados que trabajaron Sábado pero no Domingo: {exclusivos}")
+        print("Operación utilizada: Diferencia (sábado - domingo)")
 
-    turnos_largos = empleados_turno_largo(registros)
-    print(f"Empleados con todos sus turnos >= 6 horas: {turnos_largos}")
+        if resumen is not None:
+            escribir_filas_resumen('Practica03/resource/resumen_semanal.csv', resumen, escritor)
+
+        turnos_largos = analizador.turnos_largos()
+        escribir_empleados('Practica03/resource/turnos_largos.csv', turnos_largos, escritor)
 
-    gestor = GestorHorarios()
-    gestor.leer_csv('Practica03/resource/horarios.csv')
-    gestor.escribir_resumen('Practica03/resource/resumen_clases.csv')
+        if resumen is not None:
+            escribir_filas_resumen('Practica03/resource/resumen_clases.csv', resumen, escritor)
+
+    print("Se ha generado el fichero resumen_horarios.csv")
+    print(f"Empleados con todos sus turnos >= 6 horas: {turnos_largos}")
     print("Se ha generado el fichero resumen_clases.csv")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Informes de horarios de empleados")
+    parser.add_argument('--presupuesto', type=int, metavar='N',
+                        help="calcula el resumen en streaming con como mucho N registros en memoria")
+    main(parser.parse_args().presupuesto)